@@ -1,7 +1,12 @@
-import os
 import time
+_import_start = time.perf_counter()  # Startup timing (reported by /health)
+
+import os
+import json
+import uuid
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template_string, session
+import hashlib
+from flask import Blueprint, Flask, Response, g, request, jsonify, session, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from functools import wraps
@@ -10,13 +15,10 @@ import logging
 # Load env vars early
 load_dotenv()
 
-# Flask app setup
-app = Flask(__name__)
-app.secret_key = os.getenv('FLASK_SECRET_KEY', 'devtest123')
-CORS(app)
-
-# Logging setup for Vercel
-logging.basicConfig(level=logging.INFO)
+# Logging setup for Vercel: queued, non-blocking writes (see utils/logging_setup.py)
+from utils import logging_setup
+from utils.logging_setup import VERBOSE, body
+logging_setup.configure()
 logger = logging.getLogger(__name__)
 
 # Auth decorator (simple API key check)
@@ -29,20 +31,27 @@ def require_auth(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Import models (after env load)
-from models.sentiment_model import analyze_sentiment
-from models.intent_model import detect_intent
-from chains.response_chain import generate_response
+# Import models (after env load). These are cheap: LangChain and the OpenAI client load on first LLM call
+from chains.pipeline import run_pipeline, classify, canned_response, cached_reply, remember_reply
+from chains.response_cache import response_cache
+from chains.response_chain import stream_response
+from chains.batch import run_batch, BATCH_CONCURRENCY
+from models import local_classifier
+from utils.cache import get_cache
+from utils.conversation_store import get_store
+from utils import usage
+from chains.conversation_summary import render_summary, update_summary, count_tokens
+from utils import llm as llm_client
+from utils import http
+from utils import metrics
+from utils import single_flight
+from utils import outbound
 
-# Health check
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({'status': 'healthy'})
+bp = Blueprint('chat', __name__)
 
-# Demo page (HTML + JS) - Conversational chat UI
-@app.route("/", methods=["GET", "POST"])
-def index():
-    html = """
+DEMO_PAGE_MAX_AGE = int(os.getenv('DEMO_PAGE_MAX_AGE', '300'))
+
+DEMO_PAGE_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -84,7 +93,7 @@ def index():
         <script>
             let chatHistory = [];  
             
-            const API_URL = '/analyze-chat';
+            const API_URL = '/analyze-chat/stream';
             const HEADERS = { 
                 'Content-Type': 'application/json', 
                 'X-API-Key': 'devtest123' 
@@ -104,6 +113,29 @@ def index():
                 chatHistory.push({ role: isUser ? 'user' : 'bot', content });
             }
             
+            // Calls onEvent(name, data) for each SSE event in a fetch response body
+            async function readEvents(response, onEvent) {
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                        const block = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        let name = 'message', data = '';
+                        for (const line of block.split('\\n')) {
+                            if (line.startsWith('event: ')) name = line.slice(7);
+                            else if (line.startsWith('data: ')) data += line.slice(6);
+                        }
+                        onEvent(name, JSON.parse(data));
+                    }
+                }
+            }
+            
             async function sendMessage() {
                 const input = document.getElementById('message');
                 const userMessage = input.value.trim();
@@ -113,10 +145,10 @@ def index():
                 input.value = '';
                 
                 const chatContainer = document.getElementById('chat-container');
-                const thinkingDiv = document.createElement('div');
-                thinkingDiv.className = 'message bot';
-                thinkingDiv.textContent = 'Thinking...';
-                chatContainer.appendChild(thinkingDiv);
+                const botDiv = document.createElement('div');
+                botDiv.className = 'message bot';
+                botDiv.textContent = 'Thinking...';
+                chatContainer.appendChild(botDiv);
                 chatContainer.scrollTop = chatContainer.scrollHeight;
                 
                 try {
@@ -129,15 +161,22 @@ def index():
                     if (!response.ok) {
                         throw new Error(`HTTP ${response.status}: ${await response.text()}`);
                     }
-                    const result = await response.json();
-                    
-                    chatContainer.removeChild(thinkingDiv);
-                    addMessage(result.ai_response, false);
                     
-                    console.log('Sentiment:', result.sentiment, 'Intent:', result.intent);
+                    let reply = '';
+                    await readEvents(response, (name, data) => {
+                        if (name === 'meta') {
+                            console.log('Sentiment:', data.sentiment, 'Intent:', data.intent);
+                        } else if (name === 'token') {
+                            reply += data.text;
+                            botDiv.innerHTML = reply;
+                            chatContainer.scrollTop = chatContainer.scrollHeight;
+                        } else if (name === 'done') {
+                            console.log('Time:', data.analysis_time, data.stage_times);
+                        }
+                    });
+                    chatHistory.push({ role: 'bot', content: reply });
                 } catch (e) {
-                    chatContainer.removeChild(thinkingDiv);
-                    addMessage(`Error: ${e.message}. Check console (F12).`, false);
+                    botDiv.innerHTML = `Error: ${e.message}. Check console (F12).`;
                 }
             }
             
@@ -148,10 +187,135 @@ def index():
     </body>
     </html>
     """
-    return render_template_string(html)
+
+# (rendered bytes, strong ETag), filled in by create_app()
+_demo_page = (b'', '')
+
+# Startup timings in ms: module import, and process import -> first response
+startup_times = {}
+
+def create_app():
+    """Build the Flask app (used by Vercel/gunicorn via the module-level `app` below)."""
+    global _demo_page
+    app = Flask(__name__)
+    app.secret_key = os.getenv('FLASK_SECRET_KEY', 'devtest123')
+    app.json = http.FastJSONProvider(app)
+    CORS(app)
+    app.register_blueprint(bp)
+
+    # The demo page never changes at runtime: render it once, hash it for the ETag
+    body = app.jinja_env.from_string(DEMO_PAGE_HTML).render().encode()
+    _demo_page = (body, hashlib.sha256(body).hexdigest()[:32])
+
+    @app.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        g.request_id = logging_setup.start_request(request.headers.get('X-Request-ID'))
+        if request.endpoint != 'chat.prometheus_metrics':
+            g.request_done = metrics.request_started()
+
+    @app.after_request
+    def record_request(response):  # Registered first, so it runs after compression
+        response.headers['X-Request-ID'] = g.request_id
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.record_request(endpoint, request.method, response.status_code, time.perf_counter() - g.request_start)
+        if 'request_done' in g:
+            response.call_on_close(g.request_done)  # After the body is sent (or the stream ends)
+        return response
+
+    @app.after_request
+    def compress(response):
+        return http.compress_response(request, response)
+
+    @app.after_request
+    def record_first_request(response):
+        if 'first_request_ms' not in startup_times:
+            startup_times['first_request_ms'] = round((time.perf_counter() - _import_start) * 1000, 2)
+            logger.info("First request served %sms after import start", startup_times['first_request_ms'])
+        return response
+
+    return app
+
+# Health check: readiness without building LLM clients
+@bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'healthy',
+        'ready': llm_client.api_key_configured(),
+        'llm_initialized': llm_client.is_initialized(),
+        'llm_breaker': outbound.breaker.state,
+        'startup': dict(startup_times, llm_init=llm_client.init_times)
+    })
+
+# Per-worker counters (local fast path vs LLM hit rates, classification cache, conversation store)
+@bp.route('/stats', methods=['GET'])
+@require_auth
+def stats():
+    return jsonify({
+        'local_classifier': local_classifier.stats(),
+        'classification_cache': get_cache().stats(),
+        'conversation_store': get_store().stats(),
+        'http': http.stats(),
+        'single_flight': single_flight.stats(),
+        'outbound': outbound.stats(),
+        'response_cache': response_cache.stats(),
+        'llm_usage': usage.totals()
+    })
+
+# Prometheus metrics (aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set)
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+# Demo page (HTML + JS) - Conversational chat UI, rendered once in create_app()
+@bp.route("/", methods=["GET", "POST"])
+def index():
+    body, etag = _demo_page
+    # Compressed variants carry a suffixed ETag (see utils/http.py), so accept those too
+    matched = next((tag for tag in (etag, f"{etag}-gzip", f"{etag}-br") if request.if_none_match.contains(tag)), None)
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = Response(body, mimetype='text/html')
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={DEMO_PAGE_MAX_AGE}"
+    return response
+
+# Turns passed to generate_response (including the current user message) when the rolling summary is off
+CONTEXT_TURNS = int(os.getenv('CONVERSATION_CONTEXT_TURNS', '5'))
+# Keep an incrementally updated summary per conversation instead of re-summarizing raw turns
+ROLLING_SUMMARY = os.getenv('ROLLING_SUMMARY', '1') != '0'
+
+def conversation_id():
+    """Opaque id kept in the session cookie; the history itself is server-side."""
+    session.pop('history', None)  # Drop the old cookie-held history if present
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+@metrics.timed('session_load')
+def load_context(store, sid):
+    """(recent_history, summary_state, history_summary) for generate_response."""
+    if ROLLING_SUMMARY:
+        summary_state = store.get_summary(sid)
+        return [], summary_state, render_summary(summary_state)
+    return store.recent(sid, CONTEXT_TURNS), None, None
+
+@metrics.timed('session_save')
+def save_reply(store, sid, user_message, reply, summary_state):
+    """Store the bot turn and fold the finished turn into the rolling summary."""
+    saved = store.append(sid, 'bot', reply)
+    if ROLLING_SUMMARY:
+        store.set_summary(sid, update_summary(summary_state, user_message, reply))
+    return saved
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 # Main endpoint
-@app.route("/analyze-chat", methods=["POST"])
+@bp.route("/analyze-chat", methods=["POST"])
 @require_auth
 def analyze_chat():
     start_time = time.time()
@@ -161,75 +325,119 @@ def analyze_chat():
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
     
-    logger.info(f"Received message: '{user_message}'")
-    
-    # Session history for multi-turn context
-    history = session.get('history', [])
-    print(f"Loaded history length: {len(history)}")  # Debug
-    history.append({'role': 'user', 'content': user_message})
+    logger.info("Received message: '%s'", body(user_message), extra=VERBOSE)
     
-    # Sentiment analysis
-    sentiment = analyze_sentiment(user_message)
-    logger.info(f"Computed sentiment: '{sentiment}'")
+    # Server-side history for multi-turn context (only the last few turns are loaded)
+    store = get_store()
+    sid = conversation_id()
+    new_conversation = store.append(sid, 'user', user_message) == 1
     
-    # Intent detection
-    intent = detect_intent(user_message)
-    logger.info(f"Detected intent: '{intent}'")
-    
-       # Generate response based on intent (pass recent history for context)
-    recent_history = history[-5:] if len(history) >= 5 else history
-    print(f"Passing recent history length: {len(recent_history)}")  # Debug
-    if intent == "capabilities":
-        ai_response = """I specialize in <strong>custom chatbots</strong> as a Upwork freelancer! Here's what I build for clients like you:<br><br>
-<ul>
-<li><strong>Empathetic Support Bots</strong>: Detects frustration (e.g., "Fees too high?") and responds with fixes—perfect for <em>ecom/fintech</em> (live demo right here!).</li>
-<li><strong>Lead Gen Bots</strong>: Handles "Demo a bot?" with booking links + quick needs assessment.</li>
-<li><strong>Info/Query Bots</strong>: Pulls dynamic facts on your services/products.</li>
-<li><strong>Multi-Turn Convo Bots</strong>: Remembers context for seamless client chats.</li>
-</ul>
-Built with Python/Flask + OpenAI (fast & scalable on Vercel). <strong>Starting at $300</strong>—let's tailor one for your business! What's your main use case? 🚀"""
-    elif intent == "pricing":
-        ai_response = """<strong>Upwork-friendly pricing</strong> for pro bots:<br><br>
-<table>
-<tr><th>Tier</th><th>Features</th><th>Price</th><th>Timeline</th></tr>
-<tr><td>Basic</td><td>Rule-based intents, simple UI, Vercel deploy</td><td>$250-500</td><td>3-5 days</td></tr>
-<tr><td>Pro</td><td>AI-powered (sentiment/intent), multi-turn memory</td><td>$500-1k</td><td>1 week</td></tr>
-<tr><td>Custom</td><td>Your API integrations, analytics, full handover</td><td>$1k+</td><td>2 weeks</td></tr>
-</table>
-Milestone payments, 1-month support included. <em>5* reviews on Upwork</em>—DM for a <strong>free audit</strong> of your needs! 💰"""
-    elif intent == "portfolio":
-        ai_response = """<strong>My Upwork portfolio highlights</strong>:<br><br>
-<ul>
-<li><strong>Empathy Bot Demo</strong>: Live at <a href="[your-vercel-url]" target="_blank">your-vercel-url</a>—test "Frustrated with support?" for real magic. GitHub: <a href="https://github.com/AquinasRousseau/sentiment-chatbot-api" target="_blank">github.com/AquinasRousseau/sentiment-chatbot-api</a>.</li>
-<li><strong>Lead Gen Bot</strong>: Boosted client conversions 20%—code on request.</li>
-<li><strong>Client Wins</strong>: 3 bots for ecom/support, all 5* rated.</li>
-</ul>
-Full profile: <a href="https://upwork.com/freelancers/~yourprofile" target="_blank">upwork.com/freelancers/~AquinasRousseau</a>. Ready to build yours? Share your project vibe! 📁"""
-    elif intent == "test_drive":
-        ai_response = f'<em>Love demo requests</em>—based on your <strong>{sentiment}</strong> energy, let\'s schedule a quick bot walkthrough! Drop your email or needs: <a href="mailto:your-email@example.com?subject=Bot Demo Request" target="_blank">Email Me</a>. Pro tip: Mention "lead gen" for a custom sketch! 💬'
-    elif intent == "info":
-        ai_response = "<strong>All about my bots</strong>! Key perks: <em>Real-time sentiment analysis</em>, <strong>under 2s responses</strong>, seamless Vercel hosting. Ideal for client-facing apps. More deets? <a href='https://github.com/AquinasRousseau/sentiment-chatbot-api' target='_blank'>GitHub Repo</a>. What's your top feature ask?"
-    elif intent == "support":
-        ai_response = f"<em>Got your back</em>—sorry if you're <strong>{sentiment}</strong>! Bot glitch? Quick fixes: Refresh page or check console (F12). For custom help, hit me on Upwork. What's the snag? 🔧"
-    else:  # general or upwork fallback
-        ai_response = generate_response(user_message, sentiment, recent_history)
-       
-    
-    # Append bot response to history
-    history.append({'role': 'bot', 'content': ai_response})
-    session['history'] = history[-20:]  # Cap at 20 for token limits
-    print(f"Saved history length: {len(session['history'])}")  # Debug
+    # Classification + reply (fused, sequential or concurrent; see chains/pipeline.py)
+    recent_history, summary_state, history_summary = load_context(store, sid)
+    context_tokens = count_tokens(history_summary) if history_summary is not None else None
+    logger.debug("Passing recent history length: %d, summary tokens: %s", len(recent_history), context_tokens)
+    with usage.track() as tokens, outbound.deadline():
+        result = run_pipeline(user_message, recent_history, history_summary=history_summary,
+                              new_conversation=new_conversation)
+        sentiment, intent, ai_response = result["sentiment"], result["intent"], result["ai_response"]
+        logger.info("Computed sentiment: '%s', intent: '%s'", sentiment, intent)
+        
+        # Append bot response to history (the store caps turns per conversation); an LLM
+        # summary rewrite (SUMMARY_MODE=llm) gets its share of what's left of the deadline
+        saved = save_reply(store, sid, user_message, ai_response, summary_state)
+    logger.debug("Saved history length: %d", saved)
     
     analysis_time = round((time.time() - start_time) * 1000, 2)
     
-    logger.info(f"Generated response preview: '{ai_response[:50]}...' | Time: {analysis_time}ms")
+    logger.info("Generated response preview: '%s' | Time: %sms", body(ai_response), analysis_time, extra=VERBOSE)
     
     return jsonify({
         "sentiment": sentiment,
         "intent": intent,
         "ai_response": ai_response,
-        "analysis_time": f"{analysis_time}ms"
+        "analysis_time": f"{analysis_time}ms",
+        "stage_times": result["timings"],
+        "pipeline_mode": result["mode"],
+        "speculative": result["speculative"],
+        "response_cached": result["response_cached"],
+        "context_tokens": context_tokens,
+        "tokens": tokens.as_dict()
+    })
+
+# Streaming endpoint (Server-Sent Events): classification first, then the reply as it is generated
+@bp.route("/analyze-chat/stream", methods=["POST"])
+@require_auth
+def analyze_chat_stream():
+    start_time = time.time()
+    
+    data = request.json
+    user_message = data.get("message", "").strip()
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    
+    logger.info("Received message (stream): '%s'", body(user_message), extra=VERBOSE)
+    
+    store = get_store()
+    sid = conversation_id()
+    new_conversation = store.append(sid, 'user', user_message) == 1
+    recent_history, summary_state, history_summary = load_context(store, sid)
+    
+    with outbound.deadline():
+        sentiment, intent, timings = classify(user_message)
+    ai_response = canned_response(intent, sentiment)
+    if ai_response is None:
+        ai_response = cached_reply(user_message, intent, sentiment, new_conversation)
+    
+    def events():
+        yield sse('meta', {"sentiment": sentiment, "intent": intent, "stage_times": timings})
+        if ai_response is not None:
+            yield sse('token', {"text": ai_response})
+            reply = ai_response
+        else:
+            generation_start = time.time()
+            first_token_ms = None
+            chunks = []
+            # Generation gets what's left of the request's deadline
+            with outbound.deadline(outbound.REQUEST_DEADLINE - (generation_start - start_time)):
+                for text in stream_response(user_message, sentiment, recent_history, history_summary):
+                    if first_token_ms is None:
+                        first_token_ms = round((time.time() - generation_start) * 1000, 2)
+                    chunks.append(text)
+                    yield sse('token', {"text": text})
+            reply = ''.join(chunks).strip()
+            remember_reply(user_message, intent, sentiment, reply, new_conversation)
+            timings['generation_ms'] = round((time.time() - generation_start) * 1000, 2)
+            timings['first_token_ms'] = first_token_ms
+        # Full reply, once the stream is done; a summary rewrite gets what's left of the deadline
+        with outbound.deadline(outbound.REQUEST_DEADLINE - (time.time() - start_time)):
+            save_reply(store, sid, user_message, reply, summary_state)
+        analysis_time = round((time.time() - start_time) * 1000, 2)
+        logger.info("Streamed response preview: '%s' | Time: %sms", body(reply), analysis_time, extra=VERBOSE)
+        yield sse('done', {"analysis_time": f"{analysis_time}ms", "stage_times": timings})
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let proxies buffer the stream
     })
 
+# Batch scoring: JSONL in (streamed), JSONL out (streamed); no session, replies only with ?responses=1
+@bp.route("/analyze-batch", methods=["POST"])
+@require_auth
+def analyze_batch():
+    with_responses = request.args.get('responses', '0') == '1'
+    offset = request.args.get('offset', 0, type=int)
+    concurrency = min(request.args.get('concurrency', BATCH_CONCURRENCY, type=int), int(os.getenv('BATCH_MAX_CONCURRENCY', '32')))
+    logger.info("Batch started: offset=%d, concurrency=%d, responses=%s", offset, concurrency, with_responses)
+    
+    def lines():
+        for result in run_batch(request.stream, with_responses, max(concurrency, 1), offset):
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+app = create_app()
+startup_times['import_ms'] = round((time.perf_counter() - _import_start) * 1000, 2)
+
 if __name__ == "__main__":
+    # Development server only; in production run `gunicorn` (gunicorn.conf.py)
     app.run(debug=True, port=5000)
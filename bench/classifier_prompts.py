@@ -0,0 +1,106 @@
+"""Few-shot vs compact classifier prompts (CLASSIFIER_PROMPT_MODE): tokens, latency, agreement.
+
+    python -m bench.classifier_prompts                     # every task, both modes, labelled examples
+    python -m bench.classifier_prompts --tasks classify --limit 30
+    python -m bench.classifier_prompts --offline           # prompt tokens only (tiktoken), no calls
+
+Each message in data/examples.jsonl is sent once per mode, bypassing the label cache and
+the local model. Reported per task and mode: mean prompt/completion tokens per call (as
+the API reports them), p50/p95 latency, accuracy against the example labels, and how
+often the two modes agree. Without OPENAI_API_KEY the calls go to the in-process
+stand-in (bench/fake_openai.py): its token counts are approximate and its latency is
+simulated, so use a real key for numbers worth quoting.
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+
+from bench import fake_openai
+from bench.load_test import ROOT, free_port, percentile
+
+TASKS = ('sentiment', 'intent', 'classify')
+MODES = ('fewshot', 'compact')
+
+def load_examples(limit=None):
+    with open(os.path.join(ROOT, 'data', 'examples.jsonl'), encoding='utf-8') as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    return examples[:limit] if limit else examples
+
+def classifier(task):
+    """fn(text, mode) -> predicted labels, and the expected labels for an example."""
+    if task == 'sentiment':
+        from models.sentiment_model import llm_sentiment
+        return llm_sentiment, lambda ex: ex['sentiment']
+    if task == 'intent':
+        from models.intent_model import llm_intent
+        return llm_intent, lambda ex: ex['intent']
+    from models.classifier_model import llm_classify
+    return llm_classify, lambda ex: (ex['sentiment'], ex['intent'])
+
+def run(task, mode, examples):
+    from utils import usage
+    fn, expected = classifier(task)
+    latencies, predictions = [], []
+    with usage.track() as tokens:
+        for ex in examples:
+            start = time.perf_counter()
+            predictions.append(fn(ex['text'], mode=mode))
+            latencies.append(time.perf_counter() - start)
+    calls = tokens.calls or 1
+    return {
+        'prompt_tokens': tokens.prompt_tokens / calls, 'completion_tokens': tokens.completion_tokens / calls,
+        'p50_ms': percentile(latencies, 50) * 1000, 'p95_ms': percentile(latencies, 95) * 1000,
+        'accuracy': statistics.mean(p == expected(ex) for p, ex in zip(predictions, examples)),
+        'predictions': predictions,
+    }
+
+def offline(examples):
+    """Prompt tokens per call from the templates alone (tiktoken; excludes structured-output schemas)."""
+    import tiktoken
+    from utils.llm import LLM_MODEL
+    from models import sentiment_model, intent_model, classifier_model
+    try:
+        encoding = tiktoken.encoding_for_model(LLM_MODEL)
+    except KeyError:
+        encoding = tiktoken.get_encoding('o200k_base')
+    modules = {'sentiment': sentiment_model, 'intent': intent_model, 'classify': classifier_model}
+    print(f"{'task':<10} {'fewshot':>8} {'compact':>8} {'saved':>6}  (mean prompt tokens, {len(examples)} messages)")
+    for task, module in modules.items():
+        fewshot = statistics.mean(len(encoding.encode(module.PROMPT_TEMPLATE.format(text=ex['text']))) for ex in examples)
+        compact = statistics.mean(len(encoding.encode(module.COMPACT_PROMPT)) + len(encoding.encode(ex['text']))
+                                  for ex in examples)
+        print(f"{task:<10} {fewshot:>8.1f} {compact:>8.1f} {1 - compact / fewshot:>6.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', nargs='+', choices=TASKS, default=list(TASKS))
+    parser.add_argument('--limit', type=int, help="Use only the first N examples")
+    parser.add_argument('--offline', action='store_true', help="Count prompt tokens locally; make no calls")
+    fake_openai.add_arguments(parser, prefix='fake-')
+    args = parser.parse_args()
+    examples = load_examples(args.limit)
+    if args.offline:
+        return offline(examples)
+
+    if not os.getenv('OPENAI_API_KEY'):
+        port = free_port()
+        fake_openai.serve(port, latency_ms=args.fake_latency_ms, jitter=args.fake_jitter,
+                          tokens_per_sec=args.fake_tokens_per_sec, error_rate=args.fake_error_rate, seed=args.fake_seed)
+        os.environ.update(OPENAI_API_KEY='sk-bench', OPENAI_BASE_URL=f'http://127.0.0.1:{port}/v1')
+        print(f"No OPENAI_API_KEY: using the stand-in on port {port} (approximate tokens, simulated latency)")
+
+    print(f"{'task':<10} {'mode':<8} {'prompt':>7} {'compl':>6} {'p50 ms':>8} {'p95 ms':>8} {'acc':>6}")
+    for task in args.tasks:
+        results = {mode: run(task, mode, examples) for mode in MODES}
+        for mode, r in results.items():
+            print(f"{task:<10} {mode:<8} {r['prompt_tokens']:>7.1f} {r['completion_tokens']:>6.1f} "
+                  f"{r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['accuracy']:>6.1%}")
+        fewshot, compact = results['fewshot'], results['compact']
+        agreement = statistics.mean(a == b for a, b in zip(fewshot['predictions'], compact['predictions']))
+        saved = 1 - compact['prompt_tokens'] / fewshot['prompt_tokens'] if fewshot['prompt_tokens'] else 0
+        print(f"{task:<10} prompt tokens saved {saved:.0%}, modes agree on {agreement:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Local stand-in for the OpenAI chat completions API, for benchmarks that shouldn't spend credits.
+
+    python -m bench.fake_openai --port 8765 --latency-ms 300 --jitter 0.3 --tokens-per-sec 80
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-bench python api/index.py
+
+Answers are deterministic for a given message (keyword rules, no model), so runs are
+repeatable. It speaks enough of POST /v1/chat/completions for every chain here: plain
+text, tool calls and response_format (structured output), streaming, and token usage.
+
+Timing per call: a base latency (lognormal around --latency-ms with sigma --jitter; 0 is
+fixed) plus completion tokens at --tokens-per-sec. --error-rate fails that fraction of
+calls with a 500 (the OpenAI client retries those, as it would in production).
+"""
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+INTENT_RULES = [
+    ('test_drive', ('test drive', 'demo', 'schedule')),
+    ('pricing', ('cost', 'how much', 'quote', 'pricing', 'fee')),
+    ('info', ('price', 'specs', 'range')),
+    ('support', ('help', 'broken', 'died', 'reset', 'error', 'not working')),
+    ('capabilities', ('build', 'kinds', 'can you make', 'capabilities')),
+    ('portfolio', ('portfolio', 'examples', 'past work')),
+    ('general_upwork', ('upwork', 'hire', 'freelance')),
+]
+POSITIVE_WORDS = ('love', 'great', 'awesome', 'thanks', 'amazing', 'happy')
+NEGATIVE_WORDS = ('hate', 'frustrat', 'angry', 'broken', 'terrible', 'too high', 'died', 'annoy')
+REPLY_WORDS = ("Thanks for reaching out about that. I build custom chatbots that handle exactly this kind of "
+               "conversation, from answering common questions to routing tricky cases to a human. ").split()
+
+def label_message(text):
+    """(SENTIMENT, intent) for a user message, by keyword."""
+    lower = text.lower()
+    intent = next((name for name, words in INTENT_RULES if any(w in lower for w in words)), 'general')
+    if any(w in lower for w in NEGATIVE_WORDS):
+        sentiment = 'NEGATIVE'
+    elif any(w in lower for w in POSITIVE_WORDS):
+        sentiment = 'POSITIVE'
+    else:
+        sentiment = 'NEUTRAL'
+    return sentiment, intent
+
+def user_message(prompt):
+    # Classifier prompts end with "Message: ...", the response prompt has "User's latest message: ..."
+    matches = re.findall(r"(?:^Message|User's latest message): (.*)$", prompt, re.MULTILINE)
+    return matches[-1] if matches else prompt
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+class FakeLLM:
+    def __init__(self, latency_ms=200, jitter=0.0, tokens_per_sec=100, error_rate=0.0, reply_words=60, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.reply_words = reply_words
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def sample(self):
+        """(base latency in seconds, whether this call fails)."""
+        with self._lock:
+            self.calls += 1
+            latency = self.latency_ms / 1000
+            if self.jitter:
+                latency *= math.exp(self._random.gauss(0, self.jitter))
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+            return latency, failed
+
+    def answer(self, body):
+        """(message dict, completion text used for token counts) for a chat completion request."""
+        prompt = '\n'.join(str(m.get('content') or '') for m in body['messages'])
+        # Single-prompt chains embed the message; chat-style ones (system + user) send it on its own
+        text = user_message(prompt) if len(body['messages']) == 1 else str(body['messages'][-1].get('content'))
+        sentiment, intent = label_message(text)
+        lower = prompt.lower()
+        if body.get('tools'):
+            arguments = json.dumps({'sentiment': sentiment, 'intent': intent})
+            name = body['tools'][0]['function']['name']
+            message = {'role': 'assistant', 'content': None, 'tool_calls': [
+                {'id': 'call_bench', 'type': 'function', 'function': {'name': name, 'arguments': arguments}}]}
+            return message, arguments
+        if body.get('response_format'):
+            json_schema = body['response_format'].get('json_schema') or {}
+            if json_schema.get('strict'):  # Enum-constrained fields: lowercase labels
+                sentiment = sentiment.lower()
+            content = json.dumps({'sentiment': sentiment, 'intent': intent})
+        elif 'respond' in lower:
+            words = (REPLY_WORDS * (self.reply_words // len(REPLY_WORDS) + 1))[:self.reply_words]
+            content = ' '.join(words) + ' What would you like your bot to do?'
+        elif 'sentiment' in lower and 'intent' in lower:
+            content = f"Sentiment: {sentiment} | Intent: {intent}"
+        elif 'intent' in lower:
+            content = intent
+        else:
+            content = sentiment
+        return {'role': 'assistant', 'content': content}, content
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    llm = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if not self.path.endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': f"Not supported: {self.path}", 'type': 'invalid_request_error'}})
+        latency, failed = self.llm.sample()
+        time.sleep(latency)
+        if failed:
+            return self._send_json(500, {'error': {'message': "Injected failure", 'type': 'server_error'}})
+
+        message, completion = self.llm.answer(body)
+        usage = {'prompt_tokens': count_tokens(json.dumps(body['messages'])), 'completion_tokens': count_tokens(completion)}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        per_token = 1 / self.llm.tokens_per_sec if self.llm.tokens_per_sec else 0
+        base = {'id': 'chatcmpl-bench', 'created': int(time.time()), 'model': body.get('model', 'gpt-4o-mini')}
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')  # No Content-Length: the stream ends when we close
+            self.end_headers()
+            pieces = [piece + ' ' for piece in (message['content'] or '').split(' ')]
+            for piece in pieces:
+                time.sleep(per_token * count_tokens(piece))
+                chunk = dict(base, object='chat.completion.chunk',
+                             choices=[{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}])
+                self.wfile.write(b'data: ' + json.dumps(chunk).encode() + b'\n\n')
+                self.wfile.flush()
+            if (body.get('stream_options') or {}).get('include_usage'):
+                chunk = dict(base, object='chat.completion.chunk', choices=[], usage=usage)
+                self.wfile.write(b'data: ' + json.dumps(chunk).encode() + b'\n\n')
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.close_connection = True
+            return
+
+        time.sleep(per_token * usage['completion_tokens'])
+        self._send_json(200, dict(base, object='chat.completion', usage=usage,
+                                  choices=[{'index': 0, 'message': message, 'finish_reason': 'stop'}]))
+
+def serve(port=8765, **llm_options):
+    """Start the stand-in on a background thread; returns the server (call .shutdown() to stop)."""
+    handler = type('BenchHandler', (Handler,), {'llm': FakeLLM(**llm_options)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_arguments(parser, prefix=''):
+    """Stand-in options, shared with bench.load_test (which prefixes them with --fake-)."""
+    parser.add_argument(f'--{prefix}latency-ms', type=float, default=200, help="Median base latency per call")
+    parser.add_argument(f'--{prefix}jitter', type=float, default=0.3, help="Lognormal sigma for latency (0 = fixed)")
+    parser.add_argument(f'--{prefix}tokens-per-sec', type=float, default=100, help="Completion token rate (0 = instant)")
+    parser.add_argument(f'--{prefix}error-rate', type=float, default=0.0, help="Fraction of calls that return 500")
+    parser.add_argument(f'--{prefix}reply-words', type=int, default=60, help="Length of generated replies")
+    parser.add_argument(f'--{prefix}seed', type=int, default=0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = serve(args.port, latency_ms=args.latency_ms, jitter=args.jitter, tokens_per_sec=args.tokens_per_sec,
+                   error_rate=args.error_rate, reply_words=args.reply_words, seed=args.seed)
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1 @@
+# Empty file to make 'bench' a Python package
@@ -0,0 +1,278 @@
+"""Load test for POST /analyze-chat against the local OpenAI stand-in (bench/fake_openai.py).
+
+    python -m bench.load_test                                   # gunicorn + fake LLM, both paths
+    python -m bench.load_test --concurrency 32 --requests 500 --fake-latency-ms 400
+    python -m bench.load_test --phases generated --fake-error-rate 0.05
+    python -m bench.load_test --url http://127.0.0.1:5000 --pid 1234   # a server you started
+
+Each phase sends --requests messages at --concurrency clients (one conversation per
+client). The canned phase uses messages whose intent has a canned answer, the generated
+phase ones that go through generate_response, so their latency and CPU cost are reported
+separately. Messages get a unique suffix so the classification cache doesn't answer them,
+and the spawned server runs with RESPONSE_CACHE=0, since the near-duplicate reply cache
+would still match the suffixed variants (--cacheable to allow hits in both).
+
+Reported per phase: p50/p95/p99 latency, throughput, errors, LLM tokens, server CPU
+per request (user+sys of the server process tree from /proc; Linux only, needs a spawned
+server or --pid), and requests in flight per worker (sampled from /metrics; per-worker
+series need PROMETHEUS_MULTIPROC_DIR, which gunicorn.conf.py sets).
+
+The spawned server is gunicorn with gunicorn.conf.py (gthread, preloaded app); --workers
+and --threads override its sizing.
+"""
+import os
+import sys
+import json
+import time
+import re
+import socket
+import argparse
+import contextlib
+import threading
+import statistics
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+from bench import fake_openai
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = {
+    'canned': [
+        "How much does a custom bot cost?",
+        "Show me your portfolio please",
+        "Can I schedule a test drive of the demo?",
+        "What kinds of chatbots can you build?",
+        "My bot is broken and I need help",
+    ],
+    'generated': [
+        "Hi there, tell me something fun about chatbots",
+        "I'm thinking about automating our customer emails",
+        "What do you think about AI in retail?",
+        "Good morning! Just browsing today",
+    ],
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+IN_FLIGHT_RE = re.compile(r'^chatbot_http_requests_in_flight(?:\{pid="(\d+)"\})? (\S+)$', re.MULTILINE)
+
+class InFlightSampler:
+    """Polls /metrics during a phase: requests in flight per worker pid."""
+
+    def __init__(self, url, interval=0.05):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.interval = interval
+        self.samples = {}  # pid -> [in flight at each poll]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        while not self._stop.wait(self.interval):
+            try:
+                conn.request('GET', '/metrics')
+                text = conn.getresponse().read().decode()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                continue
+            for pid, value in IN_FLIGHT_RE.findall(text):
+                self.samples.setdefault(pid or 'server', []).append(float(value))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        # Workers that served nothing in this phase (or the preloading master) are left out
+        busy = {pid: values for pid, values in self.samples.items() if any(values)}
+        return {
+            'workers': len(busy),
+            'max': max((max(values) for values in busy.values()), default=0),
+            'mean_per_worker': round(statistics.fmean(statistics.fmean(v) for v in busy.values()), 2) if busy else 0,
+        }
+
+def cpu_seconds(pid):
+    """user+sys CPU of a process and its descendants (Linux /proc), or None."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        total = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                total += sum(cpu_seconds(int(child)) or 0 for child in f.read().split())
+        return total
+    except (OSError, IndexError, ValueError):
+        return None
+
+class Client:
+    """One keep-alive connection and one conversation (session cookie)."""
+
+    def __init__(self, url, api_key):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = {'Content-Type': 'application/json', 'X-API-Key': api_key}
+        self.conn = None
+
+    def post(self, message):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        start = time.perf_counter()
+        try:
+            self.conn.request('POST', '/analyze-chat', json.dumps({'message': message}), self.headers)
+            response = self.conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            return time.perf_counter() - start, None
+        elapsed = time.perf_counter() - start
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.headers['Cookie'] = cookie.split(';', 1)[0]
+        return elapsed, json.loads(body) if response.status == 200 else None
+
+def run_phase(url, api_key, phase, requests, concurrency, cacheable, server_pid, run_id, sample_in_flight=False):
+    messages = MESSAGES[phase]
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    results = []
+
+    def worker(client):
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            message = messages[i % len(messages)]
+            if not cacheable:
+                message = f"{message} (#{run_id}-{i})"
+            results.append(client.post(message))
+
+    clients = [Client(url, api_key) for _ in range(concurrency)]
+    cpu_before = cpu_seconds(server_pid) if server_pid else None
+    sampler = InFlightSampler(url) if sample_in_flight else None
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    with sampler or contextlib.nullcontext():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+    cpu_after = cpu_seconds(server_pid) if server_pid else None
+
+    ok = [(elapsed, body) for elapsed, body in results if body is not None]
+    latencies = [elapsed * 1000 for elapsed, _ in ok]
+    generated = sum('generation_ms' in body.get('stage_times', {}) for _, body in ok)
+    report = {
+        'requests': len(results),
+        'errors': len(results) - len(ok),
+        'generated_share': round(generated / len(ok), 3) if ok else None,  # Replies that really went through the LLM
+        'throughput_rps': round(len(ok) / wall, 2),
+        'wall_s': round(wall, 2),
+    }
+    if latencies:
+        report.update({f'p{pct}_ms': round(percentile(latencies, pct), 1) for pct in (50, 95, 99)})
+        report['mean_ms'] = round(statistics.fmean(latencies), 1)
+        report['tokens_per_request'] = round(sum(body.get('tokens', {}).get('prompt_tokens', 0)
+                                                 + body.get('tokens', {}).get('completion_tokens', 0)
+                                                 for _, body in ok) / len(ok), 1)
+    if cpu_before is not None and cpu_after is not None and results:
+        report['server_cpu_ms_per_request'] = round((cpu_after - cpu_before) * 1000 / len(results), 2)
+    if sampler:
+        report['in_flight_per_worker'] = sampler.report()
+    return report
+
+def wait_for(url, proc, timeout=30):
+    deadline = time.time() + timeout
+    parts = urlsplit(url)
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not come up")
+
+def spawn_server(args, llm_base_url):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads))
+    if not args.cacheable:
+        env['RESPONSE_CACHE'] = '0'
+    if llm_base_url:  # The stand-in; otherwise the real API with the usual OPENAI_API_KEY
+        env.update(OPENAI_BASE_URL=llm_base_url, OPENAI_API_KEY='sk-bench')
+    # gunicorn.conf.py (picked up from ROOT) supplies the worker model, preload and shared stores;
+    # sizing goes through its env vars so it can see the worker count
+    cmd = [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    wait_for(url, proc)
+    return url, proc
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Test a running server instead of spawning gunicorn")
+    parser.add_argument('--pid', type=int, help="Server PID for CPU accounting with --url")
+    parser.add_argument('--phases', default='canned,generated')
+    parser.add_argument('--requests', type=int, default=200, help="Requests per phase")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per phase")
+    parser.add_argument('--cacheable', action='store_true', help="Repeat messages verbatim and keep the reply cache on")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers (spawned server)")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker (spawned server)")
+    parser.add_argument('--real-llm', action='store_true', help="Spawned server uses the real OpenAI API (costs credits)")
+    parser.add_argument('--verbose', action='store_true', help="Show the spawned server's logs")
+    fake_openai.add_arguments(parser, prefix='fake-')
+    args = parser.parse_args()
+
+    fake, server, llm_base_url = None, None, None
+    if not args.real_llm:
+        fake_port = free_port()
+        fake = fake_openai.serve(fake_port, latency_ms=args.fake_latency_ms, jitter=args.fake_jitter,
+                                 tokens_per_sec=args.fake_tokens_per_sec, error_rate=args.fake_error_rate,
+                                 reply_words=args.fake_reply_words, seed=args.fake_seed)
+        llm_base_url = f'http://127.0.0.1:{fake_port}/v1'
+    url, server_pid = args.url, args.pid
+    if url is None:
+        url, server = spawn_server(args, llm_base_url)
+        server_pid = server.pid
+
+    api_key = os.getenv('API_KEY', 'devtest123')
+    report = {'url': url, 'concurrency': args.concurrency, 'phases': {}}
+    if fake:
+        report['fake_llm'] = {'latency_ms': args.fake_latency_ms, 'jitter': args.fake_jitter,
+                              'tokens_per_sec': args.fake_tokens_per_sec, 'error_rate': args.fake_error_rate}
+    run_id = int(time.time())
+    try:
+        for phase in args.phases.split(','):
+            if args.warmup:
+                run_phase(url, api_key, phase, args.warmup, min(args.concurrency, args.warmup), args.cacheable, None, f'{run_id}w')
+            report['phases'][phase] = run_phase(url, api_key, phase, args.requests, args.concurrency,
+                                                args.cacheable, server_pid, run_id, sample_in_flight=True)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        if fake:
+            report['fake_llm'].update(calls=fake.RequestHandlerClass.llm.calls, errors=fake.RequestHandlerClass.llm.errors)
+            fake.shutdown()
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,54 @@
+"""Cold-start timing: import time and time to first request, each in a fresh interpreter.
+
+    python -m bench.startup_time              # import + first GET /health
+    python -m bench.startup_time --chat       # also the first POST /analyze-chat (builds the LLM client)
+    python -m bench.startup_time --runs 5
+
+--chat makes a real LLM call unless the message is answered locally or OPENAI_BASE_URL
+points at a stand-in (see bench/fake_openai.py).
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter
+CHILD = r'''
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+from api.index import app
+out = {{'import_ms': (time.perf_counter() - t0) * 1000}}
+client = app.test_client()
+t1 = time.perf_counter()
+client.get('/health')
+out['first_health_ms'] = (time.perf_counter() - t1) * 1000
+if {chat!r}:
+    t2 = time.perf_counter()
+    client.post('/analyze-chat', json={{'message': {message!r}}}, headers={{'X-API-Key': {api_key!r}}})
+    out['first_chat_ms'] = (time.perf_counter() - t2) * 1000
+out['time_to_first_request_ms'] = out['import_ms'] + out['first_health_ms']
+print(json.dumps(out))
+'''
+
+def measure(chat=False, message="Tell me something interesting about chatbots"):
+    code = CHILD.format(root=ROOT, chat=chat, message=message, api_key=os.getenv('API_KEY', 'devtest123'))
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv('OPENAI_API_KEY', 'sk-startup-check'))
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--chat', action='store_true', help="Also time the first /analyze-chat")
+    args = parser.parse_args()
+
+    runs = [measure(args.chat) for _ in range(args.runs)]
+    summary = {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+    print(json.dumps({'runs': args.runs, 'median_ms': summary}, indent=2))
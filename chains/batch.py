@@ -0,0 +1,134 @@
+"""Batch scoring over JSONL transcripts (used by POST /analyze-batch and the CLI below).
+
+Input: one JSON object per line with "message" (optionally "id"). Lines are read lazily
+and scored on a bounded thread pool; results come back in input order as dicts:
+    {"line": 12, "id": ..., "sentiment": ..., "intent": ..., "ai_response": ..., "tokens": ...}
+    {"line": 13, "error": "..."}
+The last item is {"summary": {...}} with counts and throughput.
+
+CLI:
+    python -m chains.batch transcripts.jsonl -o scored.jsonl [--responses] [--concurrency 8] [--offset N | --resume]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from chains.pipeline import classify, canned_response, cached_reply, remember_reply
+from chains.response_chain import generate_response
+from utils import usage
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+
+def score_line(line_no, raw, with_responses=False):
+    """Score one JSONL line; parse/processing problems become a per-line error."""
+    try:
+        item = json.loads(raw)
+        message = (item.get('message') or '').strip() if isinstance(item, dict) else ''
+        if not message:
+            return {"line": line_no, "error": "No message provided"}
+        with usage.track() as tracker:
+            sentiment, intent, _ = classify(message)
+            result = {"line": line_no, "id": item.get('id'), "sentiment": sentiment, "intent": intent}
+            if with_responses:
+                # Each line is a standalone first message, so near-duplicates can share a reply
+                reply = canned_response(intent, sentiment) or cached_reply(message, intent, sentiment, True)
+                if reply is None:
+                    reply = generate_response(message, sentiment, [])
+                    remember_reply(message, intent, sentiment, reply, True)
+                result["ai_response"] = reply
+        result["tokens"] = tracker.total_tokens
+        return result
+    except Exception as e:
+        logging.error("Batch line %d error: %s", line_no, e)
+        return {"line": line_no, "error": str(e)}
+
+def run_batch(lines, with_responses=False, concurrency=BATCH_CONCURRENCY, offset=0):
+    """Yield one result per non-blank input line (in order), then a summary.
+
+    Lines before `offset` (0-based) are skipped, so a run can resume at summary['next_offset'].
+    At most 2 * concurrency lines are read ahead of the slowest pending one.
+    """
+    start = time.perf_counter()
+    counts = {"processed": 0, "errors": 0, "tokens": 0}
+    next_offset = offset
+    pending = deque()
+
+    def drain(result):
+        counts["processed"] += 1
+        counts["errors"] += 'error' in result
+        counts["tokens"] += result.get('tokens', 0)
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as pool:
+        for line_no, raw in enumerate(lines):
+            if line_no < offset:
+                continue
+            next_offset = line_no + 1
+            if isinstance(raw, bytes):
+                raw = raw.decode('utf-8', errors='replace')
+            if not raw.strip():
+                continue
+            pending.append(pool.submit(score_line, line_no, raw, with_responses))
+            while len(pending) >= 2 * concurrency:
+                yield drain(pending.popleft().result())
+        while pending:
+            yield drain(pending.popleft().result())
+
+    elapsed = time.perf_counter() - start
+    yield {"summary": dict(
+        counts,
+        offset=offset,
+        next_offset=next_offset,
+        elapsed_s=round(elapsed, 3),
+        messages_per_sec=round(counts["processed"] / elapsed, 2) if elapsed else 0.0,
+        tokens_per_sec=round(counts["tokens"] / elapsed, 2) if elapsed else 0.0,
+    )}
+
+def _resume_offset(path):
+    """Next input line after the last one recorded in an existing output file."""
+    last = None
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    last = json.loads(line).get('line', last)
+                except ValueError:
+                    pass  # Partial line from an interrupted run
+    except FileNotFoundError:
+        return 0
+    return 0 if last is None else last + 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a JSONL transcript archive (sentiment/intent, optional replies)")
+    parser.add_argument('input', help="JSONL file ('-' for stdin)")
+    parser.add_argument('-o', '--output', help="JSONL results file (default stdout)")
+    parser.add_argument('--responses', action='store_true', help="Also generate replies")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument('--offset', type=int, default=0, help="Skip this many input lines")
+    parser.add_argument('--resume', action='store_true', help="Continue after the last line already in --output")
+    args = parser.parse_args()
+
+    offset = args.offset
+    if args.resume and args.output:
+        offset = _resume_offset(args.output)
+        print(f"Resuming at line {offset}", file=sys.stderr)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    sink = open(args.output, 'a' if args.resume else 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for result in run_batch(source, args.responses, args.concurrency, offset):
+            if 'summary' in result:
+                print(json.dumps(result['summary']), file=sys.stderr)  # Kept out of the results file so --resume works
+            else:
+                sink.write(json.dumps(result, ensure_ascii=False) + '\n')
+                sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
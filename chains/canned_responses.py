@@ -0,0 +1,52 @@
+"""Canned HTML answers for intents that don't need generate_response.
+
+Every (intent, sentiment) answer is built once at import, so serving one is a dict lookup.
+"""
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+
+# {sentiment} is filled in per sentiment when the registry is built
+CANNED_TEMPLATES = {
+    "capabilities": """I specialize in <strong>custom chatbots</strong> as a Upwork freelancer! Here's what I build for clients like you:<br><br>
+<ul>
+<li><strong>Empathetic Support Bots</strong>: Detects frustration (e.g., "Fees too high?") and responds with fixes—perfect for <em>ecom/fintech</em> (live demo right here!).</li>
+<li><strong>Lead Gen Bots</strong>: Handles "Demo a bot?" with booking links + quick needs assessment.</li>
+<li><strong>Info/Query Bots</strong>: Pulls dynamic facts on your services/products.</li>
+<li><strong>Multi-Turn Convo Bots</strong>: Remembers context for seamless client chats.</li>
+</ul>
+Built with Python/Flask + OpenAI (fast & scalable on Vercel). <strong>Starting at $300</strong>—let's tailor one for your business! What's your main use case? 🚀""",
+    "pricing": """<strong>Upwork-friendly pricing</strong> for pro bots:<br><br>
+<table>
+<tr><th>Tier</th><th>Features</th><th>Price</th><th>Timeline</th></tr>
+<tr><td>Basic</td><td>Rule-based intents, simple UI, Vercel deploy</td><td>$250-500</td><td>3-5 days</td></tr>
+<tr><td>Pro</td><td>AI-powered (sentiment/intent), multi-turn memory</td><td>$500-1k</td><td>1 week</td></tr>
+<tr><td>Custom</td><td>Your API integrations, analytics, full handover</td><td>$1k+</td><td>2 weeks</td></tr>
+</table>
+Milestone payments, 1-month support included. <em>5* reviews on Upwork</em>—DM for a <strong>free audit</strong> of your needs! 💰""",
+    "portfolio": """<strong>My Upwork portfolio highlights</strong>:<br><br>
+<ul>
+<li><strong>Empathy Bot Demo</strong>: Live at <a href="[your-vercel-url]" target="_blank">your-vercel-url</a>—test "Frustrated with support?" for real magic. GitHub: <a href="https://github.com/AquinasRousseau/sentiment-chatbot-api" target="_blank">github.com/AquinasRousseau/sentiment-chatbot-api</a>.</li>
+<li><strong>Lead Gen Bot</strong>: Boosted client conversions 20%—code on request.</li>
+<li><strong>Client Wins</strong>: 3 bots for ecom/support, all 5* rated.</li>
+</ul>
+Full profile: <a href="https://upwork.com/freelancers/~yourprofile" target="_blank">upwork.com/freelancers/~AquinasRousseau</a>. Ready to build yours? Share your project vibe! 📁""",
+    "test_drive": '<em>Love demo requests</em>—based on your <strong>{sentiment}</strong> energy, let\'s schedule a quick bot walkthrough! Drop your email or needs: <a href="mailto:your-email@example.com?subject=Bot Demo Request" target="_blank">Email Me</a>. Pro tip: Mention "lead gen" for a custom sketch! 💬',
+    "info": "<strong>All about my bots</strong>! Key perks: <em>Real-time sentiment analysis</em>, <strong>under 2s responses</strong>, seamless Vercel hosting. Ideal for client-facing apps. More deets? <a href='https://github.com/AquinasRousseau/sentiment-chatbot-api' target='_blank'>GitHub Repo</a>. What's your top feature ask?",
+    "support": "<em>Got your back</em>—sorry if you're <strong>{sentiment}</strong>! Bot glitch? Quick fixes: Refresh page or check console (F12). For custom help, hit me on Upwork. What's the snag? 🔧",
+}
+
+# Intents answered from canned HTML instead of generate_response
+CANNED_INTENTS = frozenset(CANNED_TEMPLATES)
+
+CANNED_RESPONSES = {
+    (intent, sentiment): template.replace('{sentiment}', sentiment)
+    for intent, template in CANNED_TEMPLATES.items()
+    for sentiment in SENTIMENTS
+}
+
+def canned_response(intent, sentiment):
+    """Canned HTML answer for an intent, or None if the intent needs generate_response."""
+    response = CANNED_RESPONSES.get((intent, sentiment))
+    if response is None and intent in CANNED_TEMPLATES:
+        response = CANNED_TEMPLATES[intent].replace('{sentiment}', sentiment)  # Unexpected sentiment label
+    return response
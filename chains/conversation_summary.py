@@ -0,0 +1,101 @@
+"""Rolling per-conversation summary for generate_response.
+
+Instead of rebuilding context from raw history every request, each conversation keeps a
+small summary state that is updated once per turn and stored next to its turns:
+    {'earlier': "condensed older turns", 'recent': ["User: ... | Bot: ...", ...], 'turns': n}
+Bot replies have their HTML stripped before they go in, and the rendered summary is kept
+under SUMMARY_TOKEN_BUDGET, so the prompt stays the same size however long the chat gets.
+"""
+import os
+import re
+import html
+import logging
+
+SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '300'))
+SUMMARY_RECENT_TURNS = int(os.getenv('SUMMARY_RECENT_TURNS', '3'))
+# local: older turns are condensed to their first words; llm: folded into a short LLM-written recap
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'local')
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+_encoding = None
+
+def strip_markup(text):
+    """Plain text from a (possibly HTML) bot reply."""
+    return _SPACE_RE.sub(' ', html.unescape(_TAG_RE.sub(' ', text))).strip()
+
+def clip(text, max_words):
+    """First max_words words, never cutting inside a word."""
+    words = text.split()
+    return ' '.join(words[:max_words]) + ('...' if len(words) > max_words else '')
+
+def count_tokens(text):
+    """Token count for gpt-4o-mini (tiktoken), or a chars/4 estimate if tiktoken is unavailable."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('o200k_base')
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text))
+
+def new_summary():
+    return {'earlier': '', 'recent': [], 'turns': 0}
+
+def render_summary(state):
+    """Summary text for the prompt's history slot."""
+    if not state or not state['turns']:
+        return 'No prior context.'
+    lines = []
+    if state['earlier']:
+        lines.append(f"Earlier: {state['earlier']}")
+    lines.extend(state['recent'])
+    return '\n'.join(lines)
+
+def _compress_earlier(earlier, budget):
+    """One short LLM call that rewrites the older-context recap under the budget."""
+    from utils.llm import get_llm  # Only needed in llm mode
+    from utils import outbound, usage
+    try:
+        prompt = (f"Rewrite this chat recap in under {budget} tokens, keeping the user's goals, "
+                  f"constraints and any decisions. Plain text only.\n\n{earlier}")
+        result = outbound.call('summary', get_llm(temperature=0.3).invoke, prompt)
+        usage.record('summary', result)
+        return result.content.strip()
+    except outbound.Unavailable as e:
+        # Out of time (or breaker open / shed): the caller trims the recap locally instead
+        logging.warning("Summary compression skipped: %s", e)
+        return earlier
+    except Exception as e:
+        logging.error("Summary compression error: %s", e)
+        return earlier
+
+def update_summary(state, user_message, bot_reply):
+    """Fold one finished turn into the summary state (returns the updated state)."""
+    state = dict(state or new_summary())
+    recent = list(state['recent'])
+    recent.append(f"User: {clip(user_message, 25)} | Bot: {clip(strip_markup(bot_reply), 20)}")
+    earlier = state['earlier']
+
+    # Turns that age out of the recent window are condensed into 'earlier' rather than dropped
+    while len(recent) > SUMMARY_RECENT_TURNS:
+        oldest = recent.pop(0)
+        user_part = oldest.split(' | Bot: ')[0][len('User: '):]
+        earlier = f"{earlier}; {clip(user_part, 12)}" if earlier else clip(user_part, 12)
+
+    state.update(earlier=earlier, recent=recent, turns=state['turns'] + 1)
+
+    # Keep the rendered summary under the token budget
+    if count_tokens(render_summary(state)) > SUMMARY_TOKEN_BUDGET and earlier:
+        recent_tokens = count_tokens('\n'.join(recent))
+        earlier_budget = max(SUMMARY_TOKEN_BUDGET - recent_tokens - 4, SUMMARY_TOKEN_BUDGET // 4)  # 4 for the 'Earlier: ' label
+        if SUMMARY_MODE == 'llm':
+            earlier = _compress_earlier(earlier, earlier_budget)
+        parts = earlier.split('; ')
+        while len(parts) > 1 and count_tokens('; '.join(parts)) > earlier_budget:
+            parts.pop(0)  # Oldest condensed turn goes last
+        state['earlier'] = '; '.join(parts)
+    return state
@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from models.sentiment_model import analyze_sentiment
+from models.intent_model import detect_intent
+from models.classifier_model import classify_message
+from chains.response_chain import generate_response, fallback_response
+from chains.response_cache import response_cache, RESPONSE_CACHE
+from utils import metrics
+from chains.canned_responses import canned_response
+
+# fused: one combined classification call (default)
+# sequential: analyze_sentiment then detect_intent
+# concurrent: both classifiers at once on a thread pool, optionally with speculative generation
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'fused' if os.getenv('FUSED_CLASSIFIER', '1') != '0' else 'sequential')
+SPECULATIVE_GENERATION = os.getenv('SPECULATIVE_GENERATION', '0') == '1'
+
+# Shared across requests; sized for a couple of LLM calls per in-flight request
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('PIPELINE_WORKERS', '16')), thread_name_prefix='pipeline')
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+def _submit(fn, *args):
+    # Carry the caller's contextvars into the worker thread
+    ctx = contextvars.copy_context()
+    return _executor.submit(ctx.run, _timed, fn, *args)
+
+def cached_reply(user_message, intent, sentiment, new_conversation):
+    """Reply from the near-duplicate cache for a conversation's first message, else None."""
+    if not RESPONSE_CACHE:
+        return None
+    if not new_conversation:
+        response_cache.bypass()  # Later turns depend on the history
+        return None
+    return response_cache.get(intent, sentiment, user_message)
+
+def remember_reply(user_message, intent, sentiment, reply, new_conversation):
+    # Fallback replies (LLM errors/degraded) aren't worth reusing
+    if RESPONSE_CACHE and new_conversation and reply != fallback_response(sentiment):
+        response_cache.put(intent, sentiment, user_message, reply)
+
+def classify(user_message, mode=None):
+    """Sentiment + intent for a message; returns (sentiment, intent, timings)."""
+    mode = mode or PIPELINE_MODE
+    timings = {}
+    if mode == 'concurrent':
+        sentiment_future = _submit(analyze_sentiment, user_message)
+        intent_future = _submit(detect_intent, user_message)
+        sentiment, timings['sentiment_ms'] = sentiment_future.result()
+        intent, timings['intent_ms'] = intent_future.result()
+    elif mode == 'fused':
+        (sentiment, intent), timings['classify_ms'] = _timed(classify_message, user_message)
+    else:
+        sentiment, timings['sentiment_ms'] = _timed(analyze_sentiment, user_message)
+        intent, timings['intent_ms'] = _timed(detect_intent, user_message)
+    metrics.record_labels(sentiment, intent)
+    return sentiment, intent, timings
+
+def run_pipeline(user_message, recent_history, mode=None, history_summary=None, new_conversation=False):
+    """Classify a message and build the reply.
+
+    history_summary (the conversation's rolling summary) replaces recent_history as LLM context when given.
+    new_conversation: this is the conversation's first message, so a cached reply to a near-duplicate may be used.
+    Returns a dict with sentiment, intent, ai_response and per-stage timings (ms).
+    """
+    mode = mode or PIPELINE_MODE
+    start = time.perf_counter()
+    speculative = None
+    response_cached = False
+
+    if mode == 'concurrent' and SPECULATIVE_GENERATION:
+        timings = {}
+        sentiment_future = _submit(analyze_sentiment, user_message)
+        intent_future = _submit(detect_intent, user_message)
+
+        sentiment, timings['sentiment_ms'] = sentiment_future.result()
+        generation_future = None
+        if not intent_future.done():
+            # Generation only needs the sentiment label, so start it before the intent is known
+            generation_future = _submit(generate_response, user_message, sentiment, recent_history, history_summary)
+
+        intent, timings['intent_ms'] = intent_future.result()
+        metrics.record_labels(sentiment, intent)
+        ai_response = canned_response(intent, sentiment)
+        if ai_response is None:
+            ai_response = cached_reply(user_message, intent, sentiment, new_conversation)
+            response_cached = ai_response is not None
+        if generation_future is not None:
+            if ai_response is not None:
+                # Canned branch won: drop the speculative call (it just finishes in the background if already running)
+                speculative = 'cancelled' if generation_future.cancel() else 'discarded'
+            else:
+                ai_response, timings['generation_ms'] = generation_future.result()
+                speculative = 'used'
+                remember_reply(user_message, intent, sentiment, ai_response, new_conversation)
+    else:
+        sentiment, intent, timings = classify(user_message, mode)
+        ai_response = canned_response(intent, sentiment)
+        if ai_response is None:
+            ai_response = cached_reply(user_message, intent, sentiment, new_conversation)
+            response_cached = ai_response is not None
+
+    if ai_response is None:  # general or upwork fallback
+        ai_response, timings['generation_ms'] = _timed(generate_response, user_message, sentiment, recent_history, history_summary)
+        remember_reply(user_message, intent, sentiment, ai_response, new_conversation)
+
+    timings['pipeline_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    logging.info("Pipeline (%s) sentiment='%s' intent='%s' timings=%s speculative=%s",
+                 mode, sentiment, intent, timings, speculative)
+    return {
+        "sentiment": sentiment,
+        "intent": intent,
+        "ai_response": ai_response,
+        "mode": mode,
+        "speculative": speculative,
+        "response_cached": response_cached,
+        "timings": timings,
+    }
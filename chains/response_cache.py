@@ -0,0 +1,152 @@
+"""Near-duplicate reply cache for generate_response (first turns only).
+
+Messages are fingerprinted locally with MinHash over character trigrams of their content
+words (stopwords dropped), so rewordings like "Hi there, tell me something fun about
+chatbots" / "hi there! tell me something fun about chat bots" share a reply. Matching is
+lexical: it catches typos, punctuation and small wording changes, not synonyms.
+
+A stored reply is reused only for the same intent + sentiment and the same number of
+negations ("I need a bot" never matches "I don't need a bot", however close the
+trigrams), when the estimated similarity is at least RESPONSE_CACHE_THRESHOLD, and only
+for a conversation's first message (later turns depend on history, so they bypass the
+cache). Lookups go through LSH buckets (bands of the signature), so they don't scan
+every entry.
+"""
+import os
+import re
+import zlib
+import random
+import threading
+from collections import OrderedDict
+from utils.cache import normalize_text
+from utils import metrics
+
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', '1') != '0'
+THRESHOLD = float(os.getenv('RESPONSE_CACHE_THRESHOLD', '0.75'))
+MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+
+NUM_PERM = 64
+BANDS, ROWS = 16, 4  # BANDS * ROWS == NUM_PERM
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)  # Fixed, so signatures are stable across processes
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD_RE = re.compile(r'\w+')
+_NEGATION_RE = re.compile(r"n['’]t\b|\b(?:not|no|never|nothing|none|nobody|neither|nor|without|cannot|dont|doesnt|didnt|"
+                          r"isnt|arent|wasnt|werent|cant|wont|wouldnt|shouldnt|couldnt|havent|hasnt)\b")
+STOPWORDS = frozenset("a an the and or but so to of in on at for with about is are was be am it this that "
+                      "i me my we our you your please just really very can could would do does".split())
+
+def shingles(text):
+    """Character trigrams of the message's content words (each word padded with < >)."""
+    words = [w for w in _WORD_RE.findall(normalize_text(text)) if w not in STOPWORDS]
+    grams = set()
+    for word in words:
+        word = f"<{word}>"
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+def negations(text):
+    """How many negation words the message has; part of the match group, so a flipped meaning is a miss."""
+    return len(_NEGATION_RE.findall(text.lower()))
+
+def signature(text):
+    """MinHash signature (NUM_PERM ints), or None for messages with no content words."""
+    hashes = [zlib.crc32(gram.encode()) for gram in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+def _bands(sig):
+    return [(i, sig[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+class ResponseCache:
+    def __init__(self, threshold=THRESHOLD, max_bytes=MAX_BYTES):
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # id -> (group, signature, reply), least recently used first
+        self._buckets = {}  # (group, band index, band values) -> set of ids
+        self._next_id = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.bypassed = self.evictions = 0
+
+    def get(self, intent, sentiment, text):
+        """Stored reply for a near-duplicate first message, or None."""
+        sig = signature(text)
+        if sig is None:
+            self._count('miss')
+            return None
+        group = (intent, sentiment, negations(text))
+        with self._lock:
+            candidates = set()
+            for band in _bands(sig):
+                candidates |= self._buckets.get((group,) + band, set())
+            best, best_score = None, self.threshold
+            for entry_id in candidates:
+                score = similarity(sig, self._entries[entry_id][1])
+                if score >= best_score:
+                    best, best_score = entry_id, score
+            if best is None:
+                self.misses += 1
+                metrics.record_response_cache('miss')
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            reply = self._entries[best][2]
+        metrics.record_response_cache('hit')
+        return reply
+
+    def put(self, intent, sentiment, text, reply):
+        sig = signature(text)
+        if sig is None:
+            return
+        group = (intent, sentiment, negations(text))
+        size = len(reply.encode()) + NUM_PERM * 8
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (group, sig, reply)
+            for band in _bands(sig):
+                self._buckets.setdefault((group,) + band, set()).add(entry_id)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._evict(next(iter(self._entries)))
+
+    def bypass(self):
+        """Count a lookup skipped because the conversation has history."""
+        self._count('bypass')
+
+    def _count(self, result):
+        with self._lock:
+            if result == 'miss':
+                self.misses += 1
+            else:
+                self.bypassed += 1
+        metrics.record_response_cache(result)
+
+    def _evict(self, entry_id):
+        group, sig, reply = self._entries.pop(entry_id)
+        for band in _bands(sig):
+            key = (group,) + band
+            bucket = self._buckets[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+        self._bytes -= len(reply.encode()) + NUM_PERM * 8
+        self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': RESPONSE_CACHE, 'entries': len(self._entries), 'bytes': self._bytes,
+                'max_bytes': self.max_bytes, 'threshold': self.threshold, 'hits': self.hits,
+                'misses': self.misses, 'bypassed': self.bypassed, 'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            }
+
+response_cache = ResponseCache()
@@ -1,16 +1,7 @@
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 import logging
-
-load_dotenv()
-
-api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in .env!")
-
-llm = ChatOpenAI(api_key=api_key, model="gpt-4o-mini", temperature=0.3)
+from utils.llm import get_llm, lazy_chain
+from utils import usage, metrics, outbound
+from utils.logging_setup import VERBOSE, body
 
 def summarize_history(history: list) -> str:
     """Quick summary of last 3 turns (user/bot pairs) to avoid token bloat."""
@@ -27,9 +18,7 @@ def summarize_history(history: list) -> str:
             summary.append(f"Latest User: {recent[i]['content'][:50]}...")
     return '\n'.join(summary) + '\nLatest: ' if summary else 'No prior context.\nLatest: '
 
-prompt = PromptTemplate(
-    input_variables=["history_summary", "user_message", "sentiment"],
-    template="""You are a helpful, professional chatbot for a developer showcasing Upwork skills. 
+PROMPT_TEMPLATE = """You are a helpful, professional chatbot for a developer showcasing Upwork skills. 
 
 Conversation history (for context): {history_summary}
 
@@ -37,23 +26,61 @@ User's latest message: {user_message}
 User's sentiment: {sentiment}
 
 Respond empathetically and concisely (under 150 words). If general, tie back to chatbot building/sales (e.g., "Sounds frustrating—I've built bots to handle that!"). End with a question to continue the convo. Keep engaging and promotional where natural."""
-)
 
-chain = prompt | llm
+def _build_chain():
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate(input_variables=["history_summary", "user_message", "sentiment"], template=PROMPT_TEMPLATE) | get_llm(temperature=0.3)
 
-def generate_response(user_message: str, sentiment: str, history: list = []) -> str:
+# prompt | llm, built on first use in each process (keeps LangChain out of import time)
+get_chain = lazy_chain(_build_chain)
+
+@metrics.timed('generate')
+def generate_response(user_message: str, sentiment: str, history: list = [], history_summary: str = None) -> str:
+    """Pass history_summary (rolling summary) to skip rebuilding context from raw history."""
     try:
-        history_summary = summarize_history(history)
-        logging.info(f"History summary: {history_summary[:100]}...")  # Debug log
-        result = chain.invoke({
+        if history_summary is None:
+            history_summary = summarize_history(history)
+        logging.info("History summary: %s", body(history_summary), extra=VERBOSE)
+        result = outbound.call('response', get_chain().invoke, {
             "history_summary": history_summary,
             "user_message": user_message,
             "sentiment": sentiment
         })
+        usage.record('response', result)
         response = result.content.strip()
-        logging.info(f"Generated response with history: '{response[:50]}...'")
+        logging.info("Generated response with history: '%s'", body(response), extra=VERBOSE)
         return response
+    except outbound.Unavailable as e:
+        logging.warning("Response generation skipped (%s); using fallback", e)
+        return fallback_response(sentiment)
     except Exception as e:
-        logging.error(f"Response generation error: {e}")
-        # Fallback: Simple empathetic reply
-        return f"I'm sorry if you're feeling {sentiment}—let's chat about custom chatbots! What feature interests you most?"
+        logging.error("Response generation error: %s", e)
+        return fallback_response(sentiment)
+
+def stream_response(user_message: str, sentiment: str, history: list = [], history_summary: str = None):
+    """Same prompt as generate_response, but yields text chunks as the LLM produces them."""
+    emitted = False
+    with metrics.timed_block('generate_stream'):
+        try:
+            if history_summary is None:
+                history_summary = summarize_history(history)
+            for chunk in outbound.stream('response', get_chain().stream, {
+                "history_summary": history_summary,
+                "user_message": user_message,
+                "sentiment": sentiment
+            }):
+                if chunk.content:
+                    emitted = True
+                    yield chunk.content
+        except outbound.Unavailable as e:
+            logging.warning("Response streaming skipped (%s); using fallback", e)
+            if not emitted:  # Out of time mid-stream just ends the reply
+                yield fallback_response(sentiment)
+        except Exception as e:
+            logging.error("Response streaming error: %s", e)
+            if not emitted:  # Mid-stream failures just end the reply
+                yield fallback_response(sentiment)
+
+def fallback_response(sentiment: str) -> str:
+    # Fallback: Simple empathetic reply
+    return f"I'm sorry if you're feeling {sentiment}—let's chat about custom chatbots! What feature interests you most?"
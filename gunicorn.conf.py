@@ -0,0 +1,57 @@
+"""Production server config: `gunicorn` from the repo root picks this file up (see README, Deployment).
+
+Requests spend most of their time waiting on the LLM API, so each worker runs a pool of
+threads (gthread) instead of one request at a time. The app is imported once in the master
+(preload_app) and forked, so the local model, templates and LangChain modules are shared
+copy-on-write; LLM clients and connection pools are built per worker on first use.
+"""
+import os
+import gc
+import glob
+import shutil
+import tempfile
+
+wsgi_app = 'api.index:app'
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', str(os.cpu_count() or 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))  # Requests in flight per worker; keep >= LLM_MAX_CONCURRENCY
+preload_app = True
+
+# Per-process state would split across workers: a conversation would lose its history whenever
+# a request lands on another worker. Share both through SQLite files on the box instead; always,
+# since `-w` on the command line overrides `workers` after this file is read
+os.environ.setdefault('CONVERSATION_STORE', 'sqlite')
+os.environ.setdefault('CLASSIFIER_CACHE', 'sqlite')
+# Long-lived workers: write logs from a background thread, off the request path
+os.environ.setdefault('LOG_QUEUE', '1')
+
+# gthread workers heartbeat from their main loop, so this only catches a hung worker, not a slow request
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))  # > REQUEST_DEADLINE, so in-flight chats finish
+# Behind a load balancer, set this above the balancer's idle timeout (e.g. 75 behind a 60s one)
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Metrics from every worker in one /metrics scrape; must be set before the app (and prometheus_client) is imported
+_own_metrics_dir = not os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if _own_metrics_dir:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='chatbot-metrics-')
+else:
+    for stale in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(stale)  # Left by a previous run; the counters would carry over
+
+def on_starting(server):
+    # Runs in the master after the preload: import what the first LLM call would, then
+    # move everything imported so far out of the GC's reach so collections in the workers
+    # don't write to (and un-share) those pages
+    from utils import llm
+    llm.warm_imports()
+    gc.freeze()
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
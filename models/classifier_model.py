@@ -0,0 +1,140 @@
+import json
+import logging
+
+# Reuse the per-field parsers from the single-label modules
+from models.sentiment_model import parse_sentiment
+from models.intent_model import parse_intent, INTENT_GLOSSES
+from models import local_classifier, labeling
+from utils.cache import make_key, prompt_version
+from utils.llm import get_llm, lazy_chain, compact_chain, LLM_MODEL, CLASSIFIER_PROMPT_MODE
+from utils import usage, metrics, outbound
+from utils.logging_setup import VERBOSE, body
+
+# Structured output fields (the pydantic model is built with the chain, keeping pydantic out of import time)
+FIELDS = {
+    'sentiment': "POSITIVE, NEGATIVE, or NEUTRAL",
+    'intent': "test_drive, info, support, capabilities, pricing, portfolio, general_upwork, or general",
+}
+
+PROMPT_TEMPLATE = """Classify the user's message on two axes:
+- sentiment: POSITIVE, NEGATIVE, or NEUTRAL (all caps)
+- intent: test_drive, info, support, capabilities, pricing, portfolio, general_upwork, or general (lowercase)
+
+Examples:
+Message: I love this app!
+Sentiment: POSITIVE | Intent: general
+
+Message: How do I reset my password?
+Sentiment: NEUTRAL | Intent: support
+
+Message: The fees are too high and I'm frustrated!
+Sentiment: NEGATIVE | Intent: pricing
+
+Message: Test drive a Model Y?
+Sentiment: NEUTRAL | Intent: test_drive
+
+Message: What's the price?
+Sentiment: NEUTRAL | Intent: info
+
+Message: My battery died
+Sentiment: NEGATIVE | Intent: support
+
+Message: What kinds of chatbots do you build?
+Sentiment: NEUTRAL | Intent: capabilities
+
+Message: How much for a custom bot?
+Sentiment: NEUTRAL | Intent: pricing
+
+Message: Show me your portfolio
+Sentiment: NEUTRAL | Intent: portfolio
+
+Message: Can you help with my Upwork project?
+Sentiment: NEUTRAL | Intent: general_upwork
+
+Message: Hi there
+Sentiment: NEUTRAL | Intent: general
+
+Message: {text}"""
+
+def _build_chain():
+    from pydantic import Field, create_model
+    from langchain_core.prompts import PromptTemplate
+    MessageClassification = create_model(
+        'MessageClassification',
+        __doc__="Both labels for one user message.",
+        **{name: (str, Field(description=description)) for name, description in FIELDS.items()})
+    # One structured round trip returns both labels (raw message kept for token usage + fallbacks)
+    return (PromptTemplate(input_variables=["text"], template=PROMPT_TEMPLATE)
+            | get_llm(temperature=0).with_structured_output(MessageClassification, include_raw=True))
+
+# Compact mode: no examples; a strict JSON schema restricts both fields to their label sets
+SENTIMENTS, INTENTS = local_classifier.LABELS['sentiment'], local_classifier.LABELS['intent']
+COMPACT_PROMPT = f"""Classify the user's message. Reply with JSON only.
+sentiment: positive, negative or neutral.
+intent: {INTENT_GLOSSES}."""
+RESPONSE_FORMAT = {'type': 'json_schema', 'json_schema': {'name': 'classification', 'strict': True, 'schema': {
+    'type': 'object',
+    'properties': {'sentiment': {'type': 'string', 'enum': SENTIMENTS}, 'intent': {'type': 'string', 'enum': INTENTS}},
+    'required': ['sentiment', 'intent'], 'additionalProperties': False,
+}}}
+
+def _build_compact_chain():
+    return compact_chain(COMPACT_PROMPT, response_format=RESPONSE_FORMAT, max_tokens=24)
+
+_chains = {'fewshot': lazy_chain(_build_chain), 'compact': lazy_chain(_build_compact_chain)}
+
+def get_chain(mode=None):
+    return _chains[mode or CLASSIFIER_PROMPT_MODE]()
+
+# Cached labels are tied to this exact prompt + schema + model; edits invalidate them automatically
+PROMPT_VERSION = (prompt_version(COMPACT_PROMPT, json.dumps(RESPONSE_FORMAT), LLM_MODEL) if CLASSIFIER_PROMPT_MODE == 'compact'
+                  else prompt_version(PROMPT_TEMPLATE, json.dumps(FIELDS), LLM_MODEL))
+
+@metrics.timed('classify')
+def classify_message(text):
+    """Return (sentiment, intent) for a message from a single LLM call."""
+    key = make_key('message', PROMPT_VERSION, text)
+    return labeling.resolve('message', text, key, llm_classify, _parse_both, ('neutral', 'general'))
+
+def _parse_compact(raw_output):
+    """(sentiment, intent) from the schema-constrained JSON; regex/keyword parse if it isn't valid."""
+    try:
+        labels = json.loads(raw_output)
+        sentiment, intent = str(labels['sentiment']).lower(), str(labels['intent']).lower()
+        if sentiment in SENTIMENTS and intent in INTENTS:
+            labeling.record_path('message', 'label')
+            return sentiment, intent
+    except (ValueError, KeyError, TypeError):
+        pass
+    return _parse_both(raw_output)
+
+def _parse_both(raw_output):
+    return parse_sentiment(raw_output), parse_intent(raw_output)
+
+def llm_classify(text, mode=None):
+    """One LLM classification (no cache or fallbacks); raises on errors."""
+    mode = mode or CLASSIFIER_PROMPT_MODE
+    if mode == 'compact':
+        result = outbound.call('classify', get_chain(mode).invoke, {"text": text})
+        usage.record('classify', result)
+        logging.info("Raw LLM classification for '%s': %s", body(text), body(result.content), extra=VERBOSE)
+        return _parse_compact(result.content)
+
+    output = outbound.call('classify', get_chain(mode).invoke, {"text": text})
+    usage.record('classify', output['raw'])
+    result = output['parsed']
+    logging.info("Raw LLM classification for '%s': %s", body(text), result, extra=VERBOSE)
+    if result is not None:
+        # Each field still goes through its own regex/keyword fallback
+        return parse_sentiment((result.sentiment or '').strip()), parse_intent((result.intent or '').strip())
+    # Output didn't match the schema: scan the raw tool arguments/content instead
+    raw = output['raw']
+    raw_output = str(raw.additional_kwargs.get('tool_calls') or raw.content)
+    logging.info("Unparsed classification output: %s", output['parsing_error'])
+    return parse_sentiment(raw_output), parse_intent(raw_output)
+
+# Standalone test
+if __name__ == "__main__":
+    print(classify_message("What kinds of chatbots do you build?"))  # ('neutral', 'capabilities')
+    print(classify_message("Fees too high—frustrated!"))  # ('negative', 'pricing')
+    print(classify_message("Hi there"))  # ('neutral', 'general')
@@ -1,21 +1,12 @@
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 import logging
 import re  # Explicit import for regex
+from models import local_classifier, labeling
+from utils.cache import make_key, prompt_version
+from utils.llm import get_llm, lazy_chain, compact_chain, LLM_MODEL, CLASSIFIER_PROMPT_MODE
+from utils import usage, metrics, outbound
+from utils.logging_setup import VERBOSE, body
 
-load_dotenv()
-
-api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in .env! Get one from platform.openai.com/api-keys and add it.")
-
-llm = ChatOpenAI(api_key=api_key, model="gpt-4o-mini", temperature=0)
-
-prompt = PromptTemplate(
-    input_variables=["text"],
-    template="""Classify the user's message into one intent: test_drive, info, support, capabilities, pricing, portfolio, general_upwork, or general.
+PROMPT_TEMPLATE = """Classify the user's message into one intent: test_drive, info, support, capabilities, pricing, portfolio, general_upwork, or general.
 Output ONLY the intent name (lowercase, no punctuation, no extra text or explanations). 
 
 Examples:
@@ -45,51 +36,86 @@ Intent: general
 
 Message: {text}
 Intent:"""
-)
 
-chain = prompt | llm
-
-def detect_intent(text):
-    intent = 'general'  # Default
-    try:
-        result = chain.invoke({"text": text})
-        raw_output = result.content.strip()
-        logging.info(f"Raw LLM intent output for '{text}': '{raw_output}'")
-        
-        # Robust extraction: Look for intent via regex (case-insensitive)
-        match = re.search(r'\b(test_drive|info|support|capabilities|pricing|portfolio|general_upwork|general)\b', raw_output.lower())
-        if match:
-            intent = match.group(1)
-            logging.info(f"Regex extracted intent: '{intent}'")
-        else:
-            # Fallback: Keyword scan
-            output_lower = raw_output.lower()
-            if any(word in output_lower for word in ['test drive', 'demo', 'schedule', 'try']):
-                intent = 'test_drive'
-            elif any(word in output_lower for word in ['price', 'specs', 'range', 'info']):
-                intent = 'info'
-            elif any(word in output_lower for word in ['help', 'support', 'issue', 'problem']):
-                intent = 'support'
-            elif any(word in output_lower for word in ['build', 'capabilities', 'kinds', 'types']):
-                intent = 'capabilities'
-            elif any(word in output_lower for word in ['cost', 'price', 'much', 'quote']):
-                intent = 'pricing'
-            elif any(word in output_lower for word in ['portfolio', 'examples', 'work', 'demo']):
-                intent = 'portfolio'
-            elif any(word in output_lower for word in ['upwork', 'hire', 'project', 'job']):
-                intent = 'general_upwork'
-            else:
-                intent = 'general'
-            logging.info(f"Fallback extracted intent: '{intent}'")
-        
-        logging.info(f"Final intent for '{text}': '{intent}'")
-        
-    except Exception as e:
-        logging.error(f"Intent error: {e}")
-        intent = 'general'
+# Compact mode: one-line glosses instead of examples, one label out, parsed straight to the label set
+INTENTS = local_classifier.LABELS['intent']
+INTENT_GLOSSES = ("test_drive (wants a demo or test drive), info (product facts or specs), support (a problem or how-to), "
+                  "capabilities (what kinds of bots can be built), pricing (cost or quotes), portfolio (past work or examples), "
+                  "general_upwork (hiring or an Upwork project), general (anything else)")
+COMPACT_PROMPT = f"Classify the user's message into one intent. Reply with only the intent name:\n{INTENT_GLOSSES}."
+
+def _build_chain():
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate(input_variables=["text"], template=PROMPT_TEMPLATE) | get_llm(temperature=0)
+
+def _build_compact_chain():
+    return compact_chain(COMPACT_PROMPT, max_tokens=5, stop=["\n"])
+
+# prompt | llm per prompt mode, built on first use in each process (keeps LangChain out of import time)
+_chains = {'fewshot': lazy_chain(_build_chain), 'compact': lazy_chain(_build_compact_chain)}
+
+def get_chain(mode=None):
+    return _chains[mode or CLASSIFIER_PROMPT_MODE]()
+
+# Cached labels are tied to this exact prompt + model; edits invalidate them automatically
+PROMPT_VERSION = prompt_version(COMPACT_PROMPT if CLASSIFIER_PROMPT_MODE == 'compact' else PROMPT_TEMPLATE, LLM_MODEL)
+
+def parse_intent(raw_output):
+    """Map raw LLM output to one of the known intents (regex first, then keyword scan)."""
+    # Robust extraction: Look for intent via regex (case-insensitive)
+    match = re.search(r'\b(test_drive|info|support|capabilities|pricing|portfolio|general_upwork|general)\b', raw_output.lower())
+    if match:
+        intent = match.group(1)
+        metrics.classification_path('intent', 'regex')
+        logging.debug("Regex extracted intent: '%s'", intent)
+        return intent
     
+    # Fallback: Keyword scan
+    output_lower = raw_output.lower()
+    if any(word in output_lower for word in ['test drive', 'demo', 'schedule', 'try']):
+        intent = 'test_drive'
+    elif any(word in output_lower for word in ['price', 'specs', 'range', 'info']):
+        intent = 'info'
+    elif any(word in output_lower for word in ['help', 'support', 'issue', 'problem']):
+        intent = 'support'
+    elif any(word in output_lower for word in ['build', 'capabilities', 'kinds', 'types']):
+        intent = 'capabilities'
+    elif any(word in output_lower for word in ['cost', 'price', 'much', 'quote']):
+        intent = 'pricing'
+    elif any(word in output_lower for word in ['portfolio', 'examples', 'work', 'demo']):
+        intent = 'portfolio'
+    elif any(word in output_lower for word in ['upwork', 'hire', 'project', 'job']):
+        intent = 'general_upwork'
+    else:
+        intent = 'general'
+    metrics.classification_path('intent', 'keyword' if intent != 'general' else 'default')
+    logging.debug("Fallback extracted intent: '%s'", intent)
+    return intent
+
+def parse_label(raw_output):
+    """Compact mode: the output should be just the intent name; anything else gets the regex/keyword parse."""
+    label = raw_output.strip().strip('."\'').lower()
+    if label in INTENTS:
+        metrics.classification_path('intent', 'label')
+        return label
+    return parse_intent(raw_output)
+
+def llm_intent(text, mode=None):
+    """One LLM classification (no cache or fallbacks); raises on errors."""
+    mode = mode or CLASSIFIER_PROMPT_MODE
+    result = outbound.call('intent', get_chain(mode).invoke, {"text": text})
+    usage.record('intent', result)
+    raw_output = result.content.strip()
+    logging.info("Raw LLM intent output for '%s': '%s'", body(text), body(raw_output), extra=VERBOSE)
+    intent = parse_label(raw_output) if mode == 'compact' else parse_intent(raw_output)
+    logging.info("Final intent for '%s': '%s'", body(text), intent, extra=VERBOSE)
     return intent
 
+@metrics.timed('intent')
+def detect_intent(text):
+    key = make_key('intent', PROMPT_VERSION, text)
+    return labeling.resolve('intent', text, key, llm_intent, parse_intent, 'general')
+
 # Standalone test
 if __name__ == "__main__":
     print(detect_intent("What kinds of chatbots do you build?"))  # capabilities
@@ -0,0 +1,54 @@
+"""The tiers every classifier goes through: local model -> cache -> one LLM call -> fallback.
+
+resolve() is shared by analyze_sentiment, detect_intent and classify_message; each passes
+its own LLM call (llm_fn), what to return when the LLM is skipped (degraded_fn, keyword
+parse of the message) and the default for unexpected errors.
+"""
+import logging
+from models import local_classifier
+from utils.cache import get_cache
+from utils import metrics, single_flight, outbound
+
+# Which label(s) a task produces, for classification_path metrics
+TASK_LABELS = {'sentiment': ('sentiment',), 'intent': ('intent',), 'message': ('sentiment', 'intent')}
+
+# Identical messages classified at the same time share one LLM call
+_in_flight = {'sentiment': single_flight.group('sentiment'), 'intent': single_flight.group('intent'),
+              'message': single_flight.group('classify')}
+
+def record_path(task, path):
+    for label in TASK_LABELS[task]:
+        metrics.classification_path(label, path)
+
+def _local(task, text):
+    # Offline fast path: skip the LLM when the local model is confident (in both labels, for 'message')
+    if task == 'message':
+        return local_classifier.fast_path_message(text)
+    return local_classifier.fast_path(task, text)
+
+def resolve(task, text, key, llm_fn, degraded_fn, default):
+    """Label(s) for text: sentiment/intent return a string, 'message' a (sentiment, intent) tuple."""
+    local = _local(task, text)
+    if local:
+        record_path(task, 'local')
+        return local
+    cache = get_cache()
+    cached = cache.get(key)
+    if cached:
+        record_path(task, 'cache')
+        return tuple(cached) if task == 'message' else cached
+    return _in_flight[task].do(key, lambda: _call_llm(task, text, key, cache, llm_fn, degraded_fn, default))
+
+def _call_llm(task, text, key, cache, llm_fn, degraded_fn, default):
+    try:
+        result = llm_fn(text)
+    except outbound.Unavailable as e:
+        # LLM skipped (breaker open, overloaded or out of time): keyword fallback on the message itself
+        logging.warning("%s classification degraded: %s", task, e)
+        return degraded_fn(text)
+    except Exception as e:
+        logging.error("%s classification error: %s", task, e)
+        record_path(task, 'error')
+        return default
+    cache.set(key, list(result) if task == 'message' else result)
+    return result
@@ -1,21 +1,12 @@
-import os
-from dotenv import load_dotenv  # Add this import
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 import re  # Assuming you have the updated version with regex
+import logging
+from models import local_classifier, labeling
+from utils.cache import make_key, prompt_version
+from utils.llm import get_llm, lazy_chain, compact_chain, LLM_MODEL, CLASSIFIER_PROMPT_MODE
+from utils import usage, metrics, outbound
+from utils.logging_setup import VERBOSE, body
 
-load_dotenv()  # Add this line—loads .env on import
-
-# Safety check (optional: prints if key missing)
-api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in .env! Get one from platform.openai.com/api-keys and add it.")
-
-llm = ChatOpenAI(api_key=api_key, model="gpt-4o-mini", temperature=0)  # Use the var for clarity
-
-prompt = PromptTemplate(
-    input_variables=["text"],
-    template="""Classify the sentiment of this user message as POSITIVE, NEGATIVE, or NEUTRAL. 
+PROMPT_TEMPLATE = """Classify the sentiment of this user message as POSITIVE, NEGATIVE, or NEUTRAL. 
 Output ONLY the word (all caps, no punctuation, no extra text or explanations). 
 
 Examples:
@@ -30,32 +21,68 @@ Sentiment: NEGATIVE
 
 Message: {text}
 Sentiment:"""
-)
 
-chain = prompt | llm
+# Compact mode: no examples, one label out (max_tokens + newline stop), parsed straight to the label set
+SENTIMENTS = local_classifier.LABELS['sentiment']
+COMPACT_PROMPT = "Classify the sentiment of the user's message. Reply with exactly one word: positive, negative or neutral."
+
+def _build_chain():
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate(input_variables=["text"], template=PROMPT_TEMPLATE) | get_llm(temperature=0)
+
+def _build_compact_chain():
+    return compact_chain(COMPACT_PROMPT, max_tokens=2, stop=["\n"])
+
+# prompt | llm per prompt mode, built on first use in each process (keeps LangChain out of import time)
+_chains = {'fewshot': lazy_chain(_build_chain), 'compact': lazy_chain(_build_compact_chain)}
+
+def get_chain(mode=None):
+    return _chains[mode or CLASSIFIER_PROMPT_MODE]()
+
+# Cached labels are tied to this exact prompt + model; edits invalidate them automatically
+PROMPT_VERSION = prompt_version(COMPACT_PROMPT if CLASSIFIER_PROMPT_MODE == 'compact' else PROMPT_TEMPLATE, LLM_MODEL)
+
+def parse_sentiment(raw_output):
+    """Map raw LLM output to positive/negative/neutral (regex first, then keyword scan)."""
+    # Robust extraction: Look for the sentiment word via regex (case-insensitive)
+    match = re.search(r'\b(positive|negative|neutral)\b', raw_output.lower())
+    if match:
+        metrics.classification_path('sentiment', 'regex')
+        return match.group(1)
+    
+    # Expanded fallback: Scan whole output for keywords
+    output_lower = raw_output.lower()
+    if any(word in output_lower for word in ['love', 'great', 'awesome', 'happy', 'pos']):
+        metrics.classification_path('sentiment', 'keyword')
+        return 'positive'
+    elif any(word in output_lower for word in ['hate', 'bad', 'frustrated', 'angry', 'neg', 'issue', 'problem', 'confusing']):
+        metrics.classification_path('sentiment', 'keyword')
+        return 'negative'
+    else:
+        metrics.classification_path('sentiment', 'default')
+        return 'neutral'  # Safe default
+
+def parse_label(raw_output):
+    """Compact mode: the output should be just the label; anything else gets the regex/keyword parse."""
+    label = raw_output.strip().strip('."\'').lower()
+    if label in SENTIMENTS:
+        metrics.classification_path('sentiment', 'label')
+        return label
+    return parse_sentiment(raw_output)
+
+def llm_sentiment(text, mode=None):
+    """One LLM classification (no cache or fallbacks); raises on errors."""
+    mode = mode or CLASSIFIER_PROMPT_MODE
+    result = outbound.call('sentiment', get_chain(mode).invoke, {"text": text})
+    usage.record('sentiment', result)
+    raw_output = result.content.strip()
+    logging.info("Raw LLM output for '%s': '%s'", body(text), body(raw_output), extra=VERBOSE)
+    return parse_label(raw_output) if mode == 'compact' else parse_sentiment(raw_output)
 
+@metrics.timed('sentiment')
 def analyze_sentiment(text):
-    try:
-        result = chain.invoke({"text": text})
-        raw_output = result.content.strip()
-        # print(f"Raw LLM output for '{text}': '{raw_output}'")  # Uncomment for debug
-        
-        # Robust extraction: Look for the sentiment word via regex (case-insensitive)
-        match = re.search(r'\b(positive|negative|neutral)\b', raw_output.lower())
-        if match:
-            return match.group(1)
-        
-        # Expanded fallback: Scan whole output for keywords
-        output_lower = raw_output.lower()
-        if any(word in output_lower for word in ['love', 'great', 'awesome', 'happy', 'pos']):
-            return 'positive'
-        elif any(word in output_lower for word in ['hate', 'bad', 'frustrated', 'angry', 'neg', 'issue', 'problem', 'confusing']):
-            return 'negative'
-        else:
-            return 'neutral'  # Safe default
-    except Exception as e:
-        print(f"Sentiment error: {e}")  # For logs
-        return 'neutral'
+    key = make_key('sentiment', PROMPT_VERSION, text)
+    return labeling.resolve('sentiment', text, key, llm_sentiment, parse_sentiment, 'neutral')
 
 # Standalone test (add if you want quick local check)
 if __name__ == "__main__":
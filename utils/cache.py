@@ -0,0 +1,239 @@
+"""Classification result cache shared by the sentiment/intent/combined classifiers.
+
+Keys are built from the normalized message text plus a prompt version hash, so editing
+a prompt template invalidates that module's entries without touching the others.
+
+Backends (CLASSIFIER_CACHE):
+- memory (default): in-process LRU with TTL and a byte cap
+- sqlite: one SQLite file (mmap'd) shared by every gunicorn worker on the box
+- off: no caching
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv('CLASSIFIER_CACHE', 'memory')
+CACHE_PATH = os.getenv('CLASSIFIER_CACHE_PATH', '/tmp/classifier_cache.sqlite3')  # /tmp is writable on Vercel
+CACHE_MAX_BYTES = int(os.getenv('CLASSIFIER_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv('CLASSIFIER_CACHE_TTL', '86400'))
+# SQLite hits only refresh an entry's LRU timestamp this often (each refresh is a write)
+CACHE_TOUCH_SECONDS = float(os.getenv('CLASSIFIER_CACHE_TOUCH_SECONDS', '300'))
+
+_SPACE_RE = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Lowercase, collapse whitespace and drop surrounding punctuation ("Pricing? " == "pricing")."""
+    return _SPACE_RE.sub(' ', text.lower()).strip(' \t\n.,!?;:"\'')
+
+def prompt_version(*parts):
+    """Short hash of a prompt template (plus anything else that changes the output, e.g. model name)."""
+    return hashlib.sha1('\x00'.join(parts).encode()).hexdigest()[:12]
+
+def make_key(namespace, version, text):
+    digest = hashlib.sha1(normalize_text(text).encode()).hexdigest()
+    return f"{namespace}:{version}:{digest}"
+
+class LRUCache:
+    """In-process LRU with per-entry TTL and a cap on total stored bytes."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (payload, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires = entry
+            if expires < time.time():
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (payload, time.time() + self.ttl)
+            self._bytes += len(key) + len(payload)
+            while self._bytes > self.max_bytes and self._data:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        payload, _ = self._data.pop(key)
+        self._bytes -= len(key) + len(payload)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory', 'entries': len(self._data), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+            }
+
+class SQLiteCache:
+    """Same API as LRUCache, backed by one SQLite file so workers on a box share entries.
+
+    Connections are per thread and per process (safe across gunicorn's fork).
+    Hit/miss/eviction counters are per worker; entries/bytes are for the shared file.
+    Reads don't write unless the entry's LRU timestamp is older than CACHE_TOUCH_SECONDS;
+    the stored size total lives in a one-row meta table updated with each write.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={max(self.max_bytes * 2, 1 << 20)}')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, size INTEGER, expires REAL, accessed REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_meta (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER)')
+            # Files from before the meta table: count once
+            conn.execute('INSERT OR IGNORE INTO cache_meta VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM cache))')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """A write transaction (taken up front, so the size total can't race another worker)."""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _delete(conn, where, args):
+        """Delete matching rows and take their size off the total; returns how many."""
+        count, size = conn.execute(f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE {where}', args).fetchone()
+        if count:
+            conn.execute(f'DELETE FROM cache WHERE {where}', args)
+            conn.execute('UPDATE cache_meta SET total = total - ? WHERE id = 0', (size,))
+        return count
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key):
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            logging.error("Classifier cache read error: %s", e)
+            self._count('misses')
+            return None
+
+    def set(self, key, value):
+        try:
+            self._set(key, value)
+        except sqlite3.Error as e:
+            logging.error("Classifier cache write error: %s", e)
+
+    def _get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute('SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        if row[1] < now:
+            with self._write() as conn:
+                self._count('evictions', self._delete(conn, 'key = ? AND expires < ?', (key, now)))
+            self._count('misses')
+            return None
+        if now - row[2] > CACHE_TOUCH_SECONDS:
+            conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        self._count('hits')
+        return json.loads(row[0])
+
+    def _set(self, key, value):
+        payload = json.dumps(value)
+        size = len(key) + len(payload)
+        now = time.time()
+        with self._write() as conn:
+            old = conn.execute('SELECT size FROM cache WHERE key = ?', (key,)).fetchone()
+            conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)', (key, payload, size, now + self.ttl, now))
+            conn.execute('UPDATE cache_meta SET total = total + ? WHERE id = 0', (size - (old[0] if old else 0),))
+            total = conn.execute('SELECT total FROM cache_meta WHERE id = 0').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Expired entries first, then least recently accessed until back under the cap
+            evicted = self._delete(conn, 'expires < ?', (now,))
+            total = conn.execute('SELECT total FROM cache_meta WHERE id = 0').fetchone()[0]
+            while total > self.max_bytes:
+                row = conn.execute('SELECT key, size FROM cache ORDER BY accessed LIMIT 1').fetchone()
+                if row is None:
+                    break
+                evicted += self._delete(conn, 'key = ?', (row[0],))
+                total -= row[1]
+        self._count('evictions', evicted)
+
+    def stats(self):
+        conn = self._conn()
+        entries = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        size = conn.execute('SELECT total FROM cache_meta WHERE id = 0').fetchone()[0]
+        with self._lock:
+            return {
+                'backend': 'sqlite', 'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+            }
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def stats(self):
+        return {'backend': 'off'}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache instance for the configured backend."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if CACHE_BACKEND == 'sqlite':
+                    _cache = SQLiteCache()
+                elif CACHE_BACKEND == 'off':
+                    _cache = NullCache()
+                else:
+                    _cache = LRUCache()
+                logging.info("Classifier cache backend: %s", CACHE_BACKEND)
+    return _cache
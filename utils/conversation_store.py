@@ -0,0 +1,196 @@
+"""Server-side conversation history, keyed by an opaque session id.
+
+The Flask session cookie only carries the id; turns live here as compact (role, content)
+records, capped per conversation and dropped after an idle TTL, along with the
+conversation's rolling summary (chains/conversation_summary.py).
+
+Backends (CONVERSATION_STORE):
+- memory: per-process dict; fine for one worker or sticky sessions
+- sqlite: one SQLite file shared by every worker on the box
+Unset, it is sqlite when WEB_CONCURRENCY > 1 (gunicorn.conf.py always sets it to sqlite)
+and memory otherwise. A memory store in a forked worker logs a warning: with more than
+one worker, conversations would lose their history whenever a request changes worker.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, deque
+
+STORE_BACKEND = os.getenv('CONVERSATION_STORE') or ('sqlite' if int(os.getenv('WEB_CONCURRENCY', '1')) > 1 else 'memory')
+STORE_PATH = os.getenv('CONVERSATION_DB_PATH', '/tmp/conversations.sqlite3')
+MAX_TURNS = int(os.getenv('CONVERSATION_MAX_TURNS', '20'))
+IDLE_TTL = float(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+SWEEP_INTERVAL = 60  # Seconds between idle sweeps
+_import_pid = os.getpid()
+
+def _as_dicts(turns):
+    return [{'role': role, 'content': content} for role, content in turns]
+
+class MemoryStore:
+    def __init__(self, max_turns=MAX_TURNS, idle_ttl=IDLE_TTL):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self._conversations = OrderedDict()  # sid -> [last_seen, deque of (role, content), summary], oldest first
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def append(self, sid, role, content):
+        """Add a turn; returns the number of turns kept for the conversation (1: it starts here)."""
+        now = time.time()
+        with self._lock:
+            entry = self._conversations.pop(sid, None)
+            if entry is not None and entry[0] < now - self.idle_ttl:
+                entry = None  # Idle past the TTL: it starts over, even if no sweep has dropped it yet
+                self.evictions += 1
+            if entry is None:
+                entry = [now, deque(maxlen=self.max_turns), None]
+            entry[0] = now
+            entry[1].append((role, content))
+            self._conversations[sid] = entry
+            self._evict_idle(now)
+            return len(entry[1])
+
+    def recent(self, sid, n):
+        """Last n turns as [{'role', 'content'}], oldest first."""
+        with self._lock:
+            entry = self._conversations.get(sid)
+            if entry is None or entry[0] < time.time() - self.idle_ttl:
+                return []
+            turns = entry[1]
+            return _as_dicts(list(turns)[-n:] if n < len(turns) else turns)
+
+    def get_summary(self, sid):
+        with self._lock:
+            entry = self._conversations.get(sid)
+            if entry is None or entry[0] < time.time() - self.idle_ttl:
+                return None
+            return entry[2]
+
+    def set_summary(self, sid, summary):
+        with self._lock:
+            entry = self._conversations.get(sid)
+            if entry is not None:
+                entry[2] = summary
+
+    def _evict_idle(self, now):
+        # Most recently used conversations are at the end, so stop at the first live one
+        cutoff = now - self.idle_ttl
+        while self._conversations:
+            sid, entry = next(iter(self._conversations.items()))
+            if entry[0] >= cutoff:
+                break
+            del self._conversations[sid]
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory', 'conversations': len(self._conversations),
+                'turns': sum(len(entry[1]) for entry in self._conversations.values()),
+                'max_turns': self.max_turns, 'idle_ttl': self.idle_ttl, 'evictions': self.evictions,
+            }
+
+class SQLiteStore:
+    """Same API as MemoryStore, in one SQLite file so any worker can serve any conversation."""
+
+    def __init__(self, path=STORE_PATH, max_turns=MAX_TURNS, idle_ttl=IDLE_TTL):
+        self.path = path
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.evictions = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS conversations (sid TEXT PRIMARY KEY, next_seq INTEGER, last_seen REAL, summary TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS turns (sid TEXT, seq INTEGER, role TEXT, content TEXT, PRIMARY KEY (sid, seq)) WITHOUT ROWID')
+            conn.execute('CREATE INDEX IF NOT EXISTS conversations_last_seen ON conversations (last_seen)')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def append(self, sid, role, content):
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT next_seq, last_seen FROM conversations WHERE sid = ?', (sid,)).fetchone()
+            if row and row[1] < now - self.idle_ttl:
+                # Idle past the TTL: it starts over, even if no sweep has dropped it yet
+                conn.execute('DELETE FROM turns WHERE sid = ?', (sid,))
+                conn.execute('DELETE FROM conversations WHERE sid = ?', (sid,))
+                row = None
+                with self._lock:
+                    self.evictions += 1
+            seq = row[0] if row else 0
+            conn.execute('INSERT INTO conversations (sid, next_seq, last_seen) VALUES (?, ?, ?) '
+                         'ON CONFLICT (sid) DO UPDATE SET next_seq = excluded.next_seq, last_seen = excluded.last_seen',
+                         (sid, seq + 1, now))
+            conn.execute('INSERT INTO turns VALUES (?, ?, ?, ?)', (sid, seq, role, content))
+            conn.execute('DELETE FROM turns WHERE sid = ? AND seq <= ?', (sid, seq - self.max_turns))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._maybe_sweep(now)
+        return min(seq + 1, self.max_turns)
+
+    def recent(self, sid, n):
+        rows = self._conn().execute(
+            'SELECT t.role, t.content FROM turns t JOIN conversations c ON c.sid = t.sid '
+            'WHERE t.sid = ? AND c.last_seen >= ? ORDER BY t.seq DESC LIMIT ?',
+            (sid, time.time() - self.idle_ttl, n)).fetchall()
+        return _as_dicts(reversed(rows))
+
+    def get_summary(self, sid):
+        row = self._conn().execute('SELECT summary FROM conversations WHERE sid = ? AND last_seen >= ?',
+                                   (sid, time.time() - self.idle_ttl)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def set_summary(self, sid, summary):
+        self._conn().execute('UPDATE conversations SET summary = ? WHERE sid = ?', (json.dumps(summary), sid))
+
+    def _maybe_sweep(self, now):
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        conn = self._conn()
+        cutoff = now - self.idle_ttl
+        conn.execute('DELETE FROM turns WHERE sid IN (SELECT sid FROM conversations WHERE last_seen < ?)', (cutoff,))
+        evicted = conn.execute('DELETE FROM conversations WHERE last_seen < ?', (cutoff,)).rowcount
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self):
+        conn = self._conn()
+        conversations = conn.execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+        turns = conn.execute('SELECT COUNT(*) FROM turns').fetchone()[0]
+        return {
+            'backend': 'sqlite', 'path': self.path, 'conversations': conversations, 'turns': turns,
+            'max_turns': self.max_turns, 'idle_ttl': self.idle_ttl, 'evictions': self.evictions,
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Process-wide conversation store for the configured backend."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteStore() if STORE_BACKEND == 'sqlite' else MemoryStore()
+                logging.info("Conversation store backend: %s", STORE_BACKEND)
+                if STORE_BACKEND == 'memory' and os.getpid() != _import_pid:
+                    logging.warning("Conversation history is per process (CONVERSATION_STORE=memory) in a forked worker; "
+                                    "set CONVERSATION_STORE=sqlite unless this is the only worker or sessions are sticky")
+    return _store
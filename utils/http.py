@@ -0,0 +1,129 @@
+"""Response layer helpers: fast JSON provider, gzip/brotli negotiation, wire-size stats.
+
+orjson and brotli are optional; without them the stdlib JSON encoder and gzip are used.
+"""
+import os
+import gzip
+import time
+import threading
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from utils import metrics
+
+try:
+    import orjson
+except ImportError:  # Optional: pip install orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+COMPRESSION = os.getenv('RESPONSE_COMPRESSION', '1') != '0'
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '500'))
+COMPRESSIBLE_TYPES = {'application/json', 'text/html', 'text/plain', 'application/javascript', 'text/css'}
+
+# Compressed bodies of strong-ETag responses (e.g. the demo page), so each variant is compressed once
+_compressed_cache = {}
+
+_stats_lock = threading.Lock()
+_stats = {'responses': 0, 'compressed': 0, 'bytes_uncompressed': 0, 'bytes_sent': 0, 'serialize_ms_total': 0.0}
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() via orjson when installed; records serialization time per request.
+
+    Output matches the default provider (sorted keys, compact or indent=2, Flask's encoding
+    of dates/dataclasses/UUIDs), except that non-ASCII text is written as UTF-8, not \\u escapes.
+    """
+
+    def _orjson_option(self, kwargs):
+        # jsonify() passes separators=(',', ':') or indent=2; anything else takes the stdlib path
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        indent = kwargs.get('indent')
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        elif indent is not None or kwargs.get('separators', (',', ':')) != (',', ':'):
+            return None
+        if set(kwargs) - {'sort_keys', 'indent', 'separators'}:
+            return None
+        return option
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        text = None
+        option = self._orjson_option(kwargs) if orjson is not None else None
+        if option is not None:
+            try:
+                text = orjson.dumps(obj, default=self.default, option=option).decode()
+            except TypeError:
+                pass  # Types orjson doesn't handle go through the default encoder
+        if text is None:
+            text = super().dumps(obj, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        if has_request_context():
+            g.serialize_ms = g.get('serialize_ms', 0.0) + elapsed
+        with _stats_lock:
+            _stats['serialize_ms_total'] += elapsed
+        return text
+
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def choose_encoding(accept_encodings):
+    """Best encoding we can produce for an Accept-Encoding header (werkzeug MIMEAccept), or None."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(request, response):
+    """after_request hook: negotiate compression and add Server-Timing / size stats."""
+    if has_request_context() and 'serialize_ms' in g:
+        response.headers.add('Server-Timing', f"serialize;dur={g.serialize_ms:.3f}")
+
+    # Streams (SSE, batch JSONL) and file passthroughs are sent as they are
+    if response.is_streamed or response.direct_passthrough:
+        return response
+    body = response.get_data()
+    sent = len(body)
+    if (COMPRESSION and response.status_code == 200 and len(body) >= COMPRESS_MIN_BYTES
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSIBLE_TYPES):
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding:
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                compressed = _compressed_cache.get((etag, encoding))
+                if compressed is None:
+                    compressed = _compressed_cache[(etag, encoding)] = encode_body(body, encoding)
+                response.set_etag(f"{etag}-{encoding}")  # Each encoding is its own representation
+            else:
+                compressed = encode_body(body, encoding)
+            response.set_data(compressed)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            sent = len(compressed)
+    record_response(len(body), sent)
+    return response
+
+def record_response(uncompressed, sent):
+    with _stats_lock:
+        _stats['responses'] += 1
+        _stats['bytes_uncompressed'] += uncompressed
+        _stats['bytes_sent'] += sent
+        _stats['compressed'] += sent < uncompressed
+    metrics.record_response_bytes(uncompressed, sent)
+
+def stats():
+    with _stats_lock:
+        out = dict(_stats)
+    out['serialize_ms_total'] = round(out['serialize_ms_total'], 3)
+    out['json_encoder'] = 'orjson' if orjson is not None else 'json'
+    out['brotli'] = brotli is not None
+    return out
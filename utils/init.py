@@ -0,0 +1 @@
+# Empty file to make 'utils' a Python package
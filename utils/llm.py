@@ -0,0 +1,113 @@
+"""Shared, lazily built LLM client for every chain.
+
+Nothing heavy happens at import: LangChain/OpenAI are imported and the client is built on
+the first get_llm() call. All chains share one pooled keep-alive httpx client, so a
+worker keeps a single connection pool to the API instead of one per module.
+"""
+import os
+import time
+import importlib
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '32'))
+# fewshot: the original example-heavy classifier prompts; compact: short static prompt + capped label output
+CLASSIFIER_PROMPT_MODE = os.getenv('CLASSIFIER_PROMPT_MODE', 'fewshot')
+
+_lock = threading.Lock()
+_http_client = None
+_http_client_pid = None
+_llms = {}
+init_times = {}  # What first use cost, in ms (reported by /health)
+
+def api_key_configured():
+    return bool(os.getenv('OPENAI_API_KEY'))
+
+def is_initialized():
+    return bool(_llms)
+
+def _deadline_transport(httpx, transport):
+    """Wrap a transport so each attempt's timeouts never outlast the current LLM call's deadline."""
+    from utils.outbound import call_time_left
+
+    class DeadlineTransport(httpx.BaseTransport):
+        def handle_request(self, request):
+            left = call_time_left()
+            if left is not None:
+                # Retries of a timed-out call see less and less time, then none
+                if left <= 0:
+                    raise httpx.TimeoutException("LLM call deadline exceeded", request=request)
+                timeouts = request.extensions.get('timeout', {})
+                request.extensions['timeout'] = {name: left if value is None else min(value, left)
+                                                 for name, value in timeouts.items()}
+            return transport.handle_request(request)
+
+        def close(self):
+            transport.close()
+
+    return DeadlineTransport()
+
+def _get_http_client():
+    global _http_client, _http_client_pid
+    # Connection pools don't survive fork; build one per worker process
+    if _http_client is None or _http_client_pid != os.getpid():
+        import httpx
+        transport = httpx.HTTPTransport(limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                                            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                                                            keepalive_expiry=30))
+        _http_client = httpx.Client(transport=_deadline_transport(httpx, transport),
+                                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=5))
+        _http_client_pid = os.getpid()
+        _llms.clear()
+    return _http_client
+
+def get_llm(temperature=0):
+    """ChatOpenAI for the given temperature, built on first use around the shared HTTP client."""
+    with _lock:
+        http_client = _get_http_client()
+        llm = _llms.get(temperature)
+        if llm is None:
+            api_key = os.getenv('OPENAI_API_KEY')
+            if not api_key:
+                from utils.outbound import NotConfigured  # outbound imports this module
+                raise NotConfigured("OPENAI_API_KEY not found in .env! Get one from platform.openai.com/api-keys and add it.")
+            start = time.perf_counter()
+            from langchain_openai import ChatOpenAI
+            init_times.setdefault('import_ms', round((time.perf_counter() - start) * 1000, 2))
+            # Retries are done by utils/outbound.py, within the call's deadline
+            llm = ChatOpenAI(api_key=api_key, model=LLM_MODEL, temperature=temperature, http_client=http_client,
+                             max_retries=0)
+            _llms[temperature] = llm
+            init_times.setdefault('client_ms', round((time.perf_counter() - start) * 1000, 2))
+            logging.info("Built LLM client (%s, temperature=%s)", LLM_MODEL, temperature)
+        return llm
+
+def lazy_chain(build):
+    """Return a getter that calls build() once per process and reuses the result."""
+    state = {}
+
+    def get():
+        pid = os.getpid()
+        if state.get('pid') != pid:
+            state['chain'] = build()
+            state['pid'] = pid
+        return state['chain']
+    return get
+
+def compact_chain(system_prompt, **llm_options):
+    """Static system prompt, then the message as the only variable part; llm_options e.g. max_tokens, stop."""
+    from langchain_core.prompts import ChatPromptTemplate
+    # The prefix is byte-identical on every call, which is what provider-side prompt caching keys on
+    prompt = ChatPromptTemplate.from_messages([('system', system_prompt), ('human', '{text}')])
+    return prompt | get_llm(temperature=0).bind(**llm_options)
+
+def warm_imports():
+    """Import LangChain/OpenAI without building clients (e.g. in a preloading parent process)."""
+    # Imported for the side effect only (module caches); import_module keeps linters from flagging them
+    importlib.import_module('langchain_core.prompts')
+    importlib.import_module('langchain_openai')
@@ -0,0 +1,154 @@
+"""Non-blocking, structured logging for the request path.
+
+With LOG_QUEUE=1 (gunicorn.conf.py sets it), configure() points the root logger at a
+QueueHandler: request threads only enqueue the record (message args unformatted), and a
+background QueueListener formats and writes. Otherwise records are written on the
+calling thread, since on serverless (Vercel) the process can be frozen or killed right
+after the response, before a listener thread has written what was queued.
+Every record carries the request's correlation id (X-Request-ID), and:
+- LOG_FORMAT: text (default) or json, one object per line
+- LOG_SAMPLE_RATE: share of requests whose verbose per-message logs (extra=VERBOSE:
+  raw LLM outputs, message previews) are kept; the rest are dropped before enqueueing
+- LOG_MESSAGE_BODIES: truncate (default, LOG_MAX_CHARS), redact, or full; applies to
+  user/LLM text passed through body()
+"""
+import os
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.05'))
+LOG_MESSAGE_BODIES = os.getenv('LOG_MESSAGE_BODIES', 'truncate')
+LOG_MAX_CHARS = int(os.getenv('LOG_MAX_CHARS', '80'))
+LOG_QUEUE = os.getenv('LOG_QUEUE', '0') == '1'
+
+# Pass as extra= on verbose per-message log calls so they are sampled
+VERBOSE = {'verbose': True}
+
+_REQUEST_ID_RE = re.compile(r'[\w.:-]{1,64}')
+
+request_id = contextvars.ContextVar('request_id', default='-')
+_sampled = contextvars.ContextVar('log_sampled', default=None)  # None: decide per record (no request)
+
+_lock = threading.Lock()
+_configured = False
+_listener = None
+_handler = None
+
+class _Body:
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        text = str(self.text)
+        if LOG_MESSAGE_BODIES == 'redact':
+            return f"<{len(text)} chars>"
+        if LOG_MESSAGE_BODIES != 'full' and len(text) > LOG_MAX_CHARS:
+            return f"{text[:LOG_MAX_CHARS]}...(+{len(text) - LOG_MAX_CHARS})"
+        return text
+
+    __repr__ = __str__
+
+def body(text):
+    """Message text for a log call, truncated or redacted when the record is formatted (not before)."""
+    return _Body(text)
+
+def start_request(rid=None):
+    """Set the correlation id (a valid incoming one or a new one; returned) and sampling for this request."""
+    if not (rid and _REQUEST_ID_RE.fullmatch(rid)):
+        rid = os.urandom(8).hex()
+    request_id.set(rid)
+    _sampled.set(random.random() < LOG_SAMPLE_RATE)
+    return rid
+
+class _ContextFilter(logging.Filter):
+    """Runs on the request thread: tags records with the request id and drops unsampled verbose ones."""
+
+    def filter(self, record):
+        if getattr(record, 'verbose', False):
+            sampled = _sampled.get()
+            if not (sampled if sampled is not None else random.random() < LOG_SAMPLE_RATE):
+                return False
+        record.request_id = request_id.get()
+        return True
+
+class _LazyQueueHandler(QueueHandler):
+    # The stock prepare() formats the message on the calling thread; leave that to the listener
+    def prepare(self, record):
+        return record
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record), 'level': record.levelname, 'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'), 'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _stream_handler():
+    stream = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == 'json':
+        stream.setFormatter(JSONFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(levelname)s:%(name)s:[%(request_id)s] %(message)s'))
+    return stream
+
+def _install(handler):
+    global _handler
+    handler.addFilter(_ContextFilter())
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    root.addHandler(handler)
+    _handler = handler
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _install(_LazyQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, _stream_handler(), respect_handler_level=True)
+    _listener.start()
+
+def _restart_in_child():
+    # The listener thread doesn't survive fork (e.g. gunicorn --preload): give each worker its own
+    global _listener
+    if _listener is not None:
+        _listener = None
+        _start_listener()
+
+def configure():
+    """Install the (queue or direct) handler on the root logger (idempotent)."""
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        for handler in list(root.handlers):  # e.g. a basicConfig() from an earlier import
+            root.removeHandler(handler)
+        logging.getLogger('httpx').setLevel(logging.WARNING)  # One INFO line per LLM call otherwise
+        if not LOG_QUEUE:
+            _install(_stream_handler())
+            return
+        _start_listener()
+        os.register_at_fork(after_in_child=_restart_in_child)
+        atexit.register(stop)
+
+def stop():
+    """Flush queued records (e.g. at exit)."""
+    if _listener is not None:
+        _listener.stop()
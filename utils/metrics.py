@@ -0,0 +1,103 @@
+"""Prometheus metrics, served by GET /metrics.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers
+(before the app is imported): each worker then writes its samples there and /metrics
+aggregates every worker's, whichever one serves the scrape. Without it, metrics are
+per-process (fine for `python api/index.py` or one worker).
+"""
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# LLM-bound stages run from ~ms (local/cache) to tens of seconds (slow generations)
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    'chatbot_stage_seconds', "Latency of one pipeline stage (sentiment, intent, classify, generate, session_load, ...)",
+    ['stage'], buckets=LATENCY_BUCKETS)
+REQUEST_SECONDS = Histogram(
+    'chatbot_http_request_seconds', "Time to build the response (streams: until the first byte is ready)",
+    ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+RESPONSE_BYTES = Counter(
+    'chatbot_http_response_bytes_total', "Response body bytes before compression and as sent", ['kind'])
+LLM_TOKENS = Counter('chatbot_llm_tokens_total', "Tokens reported by the LLM API", ['chain', 'kind'])
+LLM_CALLS = Counter('chatbot_llm_calls_total', "LLM calls that reported token usage", ['chain'])
+# How each label was decided: local, cache, regex, keyword, default (keyword scan found nothing), error
+CLASSIFICATION_PATH = Counter(
+    'chatbot_classification_path_total', "How classification labels were produced", ['task', 'path'])
+COALESCED = Counter(
+    'chatbot_coalesced_calls_total', "Calls that waited for an identical in-flight call instead of making their own", ['group'])
+LLM_SHED = Counter(
+    'chatbot_llm_shed_total', "LLM calls not made: circuit_open, queue_full, queue_timeout, deadline", ['reason'])
+BREAKER_TRANSITIONS = Counter('chatbot_llm_breaker_transitions_total', "Circuit breaker state changes", ['state'])
+# Workers whose breaker is open (summed over live workers under PROMETHEUS_MULTIPROC_DIR)
+BREAKER_OPEN = Gauge('chatbot_llm_breaker_open', "1 while this worker's LLM circuit breaker is open", multiprocess_mode='livesum')
+RESPONSE_CACHE = Counter(
+    'chatbot_response_cache_total', "Near-duplicate reply cache lookups: hit, miss, bypass (conversation has history)", ['result'])
+# One series per live worker (pid label under PROMETHEUS_MULTIPROC_DIR); /metrics scrapes aren't counted
+IN_FLIGHT = Gauge('chatbot_http_requests_in_flight', "Requests this worker is handling (streams until they finish)",
+                  multiprocess_mode='liveall')
+LABELS = Counter('chatbot_labels_total', "Final sentiment/intent labels per message", ['task', 'label'])
+
+def timed(stage):
+    """Decorator/context manager observing a stage's duration."""
+    return STAGE_SECONDS.labels(stage=stage).time()
+
+@contextmanager
+def timed_block(stage):
+    # Like timed(), for generators and other code where a decorator would stop the clock too early
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+def classification_path(task, path):
+    CLASSIFICATION_PATH.labels(task=task, path=path).inc()
+
+def record_coalesced(group):
+    COALESCED.labels(group=group).inc()
+
+def record_shed(reason):
+    LLM_SHED.labels(reason=reason).inc()
+
+def record_breaker_state(state):
+    BREAKER_TRANSITIONS.labels(state=state).inc()
+    BREAKER_OPEN.set(1 if state == 'open' else 0)
+
+def record_response_cache(result):
+    RESPONSE_CACHE.labels(result=result).inc()
+
+def record_labels(sentiment, intent):
+    LABELS.labels(task='sentiment', label=sentiment).inc()
+    LABELS.labels(task='intent', label=intent).inc()
+
+def record_tokens(chain, prompt_tokens, completion_tokens):
+    LLM_CALLS.labels(chain=chain).inc()
+    LLM_TOKENS.labels(chain=chain, kind='prompt').inc(prompt_tokens)
+    LLM_TOKENS.labels(chain=chain, kind='completion').inc(completion_tokens)
+
+def request_started():
+    """Count a request as in flight; returns the callback that ends it."""
+    IN_FLIGHT.inc()
+    return IN_FLIGHT.dec
+
+def record_request(endpoint, method, status, seconds):
+    REQUEST_SECONDS.labels(endpoint=endpoint, method=method, status=str(status)).observe(seconds)
+
+def record_response_bytes(uncompressed, sent):
+    RESPONSE_BYTES.labels(kind='uncompressed').inc(uncompressed)
+    RESPONSE_BYTES.labels(kind='sent').inc(sent)
+
+def render():
+    """(body, content type) for the /metrics endpoint."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
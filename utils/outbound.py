@@ -0,0 +1,276 @@
+"""Outbound LLM call control: concurrency limit + queue, request deadlines, circuit breaker.
+
+Every chain calls the LLM through call()/stream(), which in order:
+1. fails fast with CircuitOpen while the breaker is open,
+2. waits for one of LLM_MAX_CONCURRENCY slots (at most LLM_MAX_QUEUE callers may wait;
+   the rest are shed at once),
+3. runs the call with a timeout taken from the request's deadline: each stage gets its
+   share (STAGE_SHARES) of the time left, and utils/llm.py clamps the HTTP timeouts to it,
+4. retries transient API errors (up to LLM_MAX_RETRIES) only while the backoff still fits
+   in that timeout. The OpenAI client's own retries are off (their sleeps ignore it).
+
+All failures raised here subclass Unavailable, so callers can degrade (keyword labels,
+canned fallback reply) instead of waiting on a struggling API. State is per worker.
+"""
+import os
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from utils import metrics
+from utils.llm import LLM_TIMEOUT
+
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '32'))
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '15'))  # End-to-end budget for one /analyze-chat
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+MIN_CALL_SECONDS = 0.5  # Less budget than this left: don't bother calling
+# Share of the remaining budget a stage may use; generation gets whatever classification left
+STAGE_SHARES = {'sentiment': 0.35, 'intent': 0.35, 'classify': 0.35, 'summary': 0.25, 'response': 1.0}
+
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))  # Recent calls considered
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '5'))
+BREAKER_FAILURE_RATIO = float(os.getenv('BREAKER_FAILURE_RATIO', '0.5'))  # Failed or slow calls that trip it
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv('BREAKER_SLOW_CALL_SECONDS', '8'))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '30'))  # Seconds open before a trial call
+
+class Unavailable(Exception):
+    """The LLM wasn't called (or was given up on); use a fallback."""
+
+class CircuitOpen(Unavailable):
+    pass
+
+class Shed(Unavailable):
+    pass
+
+class DeadlineExceeded(Unavailable):
+    pass
+
+class NotConfigured(Unavailable):
+    pass
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)  # time.monotonic() value
+_call_deadline = contextvars.ContextVar('llm_call_deadline', default=None)
+
+@contextmanager
+def deadline(seconds=REQUEST_DEADLINE):
+    """Give LLM calls made in this context (and pipeline threads it starts) a shared time budget."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining():
+    """Seconds left of the request deadline, or None without one."""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+def call_time_left():
+    """Seconds left for the LLM call running in this context (used to clamp HTTP timeouts), or None."""
+    end = _call_deadline.get()
+    return None if end is None else end - time.monotonic()
+
+class CircuitBreaker:
+    """Opens when too many recent calls failed or were slow; after a cooldown lets one trial call through."""
+
+    def __init__(self):
+        self.state = 'closed'
+        self._outcomes = deque(maxlen=BREAKER_WINDOW)  # True = failed or slow
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go out; returns True if it is the half-open trial call."""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < BREAKER_COOLDOWN:
+                    raise CircuitOpen("LLM circuit breaker is open")
+                self._set_state('half_open')
+            if self.state == 'half_open':
+                if self._trial_running:
+                    raise CircuitOpen("LLM circuit breaker is waiting on a trial call")
+                self._trial_running = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        # The trial call was shed before it went out; let the next caller try
+        with self._lock:
+            self._trial_running = False
+
+    def record(self, failed):
+        with self._lock:
+            if self.state == 'half_open':
+                self._trial_running = False
+                if failed:
+                    self._trip()
+                else:
+                    self._outcomes.clear()
+                    self._set_state('closed')
+                return
+            self._outcomes.append(failed)
+            if (self.state == 'closed' and len(self._outcomes) >= BREAKER_MIN_CALLS
+                    and sum(self._outcomes) / len(self._outcomes) >= BREAKER_FAILURE_RATIO):
+                self._trip()
+
+    def _trip(self):
+        self._opened_at = time.monotonic()
+        self.trips += 1
+        self._set_state('open')
+        logging.warning("LLM circuit breaker opened (cooldown %ss)", BREAKER_COOLDOWN)
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.record_breaker_state(state)
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'trips': self.trips, 'recent_calls': len(self._outcomes),
+                    'recent_failures': sum(self._outcomes)}
+
+breaker = CircuitBreaker()
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_state_lock = threading.Lock()
+_waiting = 0
+_in_flight = 0
+_shed = {}
+
+def _reject(reason, error):
+    with _state_lock:
+        _shed[reason] = _shed.get(reason, 0) + 1
+    metrics.record_shed(reason)
+    raise error
+
+class _CallTiming:
+    def __init__(self, timeout):
+        self.timeout = timeout  # Seconds
+        self.suspended = 0.0  # Seconds a stream sat at yield waiting on its reader; not the LLM's time
+
+@contextmanager
+def _slot(stage):
+    """Admission for one LLM call; yields its _CallTiming."""
+    global _waiting, _in_flight
+    left = remaining()
+    budget = LLM_TIMEOUT if left is None else min(LLM_TIMEOUT, left * STAGE_SHARES.get(stage, 1.0))
+    if budget < MIN_CALL_SECONDS:
+        _reject('deadline', DeadlineExceeded(f"No time left for {stage}"))
+    try:
+        trial = breaker.before_call()
+    except CircuitOpen as e:
+        _reject('circuit_open', e)
+
+    start = time.monotonic()
+    if not _slots.acquire(blocking=False):
+        with _state_lock:
+            queue_full = _waiting >= LLM_MAX_QUEUE
+            if not queue_full:
+                _waiting += 1
+        acquired = False
+        if not queue_full:
+            try:
+                acquired = _slots.acquire(timeout=budget - MIN_CALL_SECONDS)
+            finally:
+                with _state_lock:
+                    _waiting -= 1
+        if not acquired:
+            if trial:
+                breaker.cancel_trial()
+            if queue_full:
+                _reject('queue_full', Shed(f"LLM queue full ({LLM_MAX_QUEUE} waiting)"))
+            _reject('queue_timeout', Shed(f"No LLM slot free within {stage}'s budget"))
+    timeout = budget - (time.monotonic() - start)
+
+    with _state_lock:
+        _in_flight += 1
+    call_start = time.monotonic()
+    token = _call_deadline.set(call_start + timeout)
+    timing = _CallTiming(timeout)
+    failed = True
+    try:
+        yield timing
+        failed = False
+    except GeneratorExit:
+        failed = False  # A stream the client stopped reading isn't an LLM failure
+        raise
+    finally:
+        _call_deadline.reset(token)
+        elapsed = time.monotonic() - call_start - timing.suspended
+        with _state_lock:
+            _in_flight -= 1
+        _slots.release()
+        breaker.record(failed or elapsed > BREAKER_SLOW_CALL_SECONDS)
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying after error, or None if it isn't worth retrying."""
+    import openai
+    if isinstance(error, openai.APIStatusError):
+        if not (error.status_code in (408, 409, 429) or error.status_code >= 500):
+            return None
+        retry_after = error.response.headers.get('retry-after')
+        if retry_after and retry_after.replace('.', '', 1).isdigit() and float(retry_after) <= 60:
+            return float(retry_after)
+    elif not isinstance(error, openai.APIConnectionError):  # Includes APITimeoutError
+        return None
+    return min(0.5 * 2 ** attempt, 8) * random.uniform(0.75, 1)  # Same backoff as the OpenAI client
+
+def _give_up(stage, error):
+    # Timeouts mean the stage ran out of budget: callers should degrade, not treat it as an error
+    import httpx
+    import openai
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        raise DeadlineExceeded(f"{stage} timed out") from error
+    raise error
+
+def _wait_to_retry(stage, error, attempt):
+    """Sleep before the next attempt if one fits in the call's time; otherwise raise."""
+    delay = None if attempt >= LLM_MAX_RETRIES else _retry_delay(error, attempt)
+    left = call_time_left()
+    if delay is None or (left is not None and left - delay < MIN_CALL_SECONDS):
+        _give_up(stage, error)
+    logging.info("Retrying %s in %.2fs after %s", stage, delay, type(error).__name__)
+    time.sleep(delay)
+
+def call(stage, fn, *args):
+    """fn(*args) under the limiter, deadline and breaker."""
+    with _slot(stage):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args)
+            except Exception as e:
+                _wait_to_retry(stage, e, attempt)
+                attempt += 1
+
+def stream(stage, iterable_fn, *args):
+    """Like call(), for a streamed LLM call: the slot is held until the stream is consumed."""
+    with _slot(stage) as timing:
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for chunk in iterable_fn(*args):
+                    started = True
+                    paused = time.monotonic()
+                    try:
+                        yield chunk
+                    finally:
+                        # A slow SSE client isn't a slow LLM: leave out time spent waiting on the reader
+                        timing.suspended += time.monotonic() - paused
+                return
+            except Exception as e:
+                if started:  # Part of the reply is already out; can't start over
+                    _give_up(stage, e)
+                _wait_to_retry(stage, e, attempt)
+                attempt += 1
+
+def stats():
+    with _state_lock:
+        queue = {'max_concurrency': LLM_MAX_CONCURRENCY, 'max_queue': LLM_MAX_QUEUE,
+                 'in_flight': _in_flight, 'waiting': _waiting, 'shed': dict(_shed)}
+    return dict(queue, breaker=breaker.stats(), request_deadline=REQUEST_DEADLINE)
@@ -0,0 +1,61 @@
+"""Single-flight: concurrent identical calls in a worker share one execution.
+
+The first caller for a key runs the function; callers that arrive with the same key while
+it is running wait for that result (or exception) instead of starting their own. Used for
+temperature-0 classification calls, where identical messages get identical answers.
+"""
+import threading
+from concurrent.futures import Future
+from utils import metrics
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}  # key -> Future of the running call
+        self._lock = threading.Lock()
+        self.calls = 0  # Executions
+        self.coalesced = 0  # Callers that shared someone else's execution
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            metrics.record_coalesced(self.name)
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+def group(name):
+    """The process-wide SingleFlight for a name (one per classifier)."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+def stats():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {flight.name: flight.stats() for flight in groups}
@@ -0,0 +1,66 @@
+"""Token usage accounting for LLM calls.
+
+Chains call record() with the AIMessage they got back. Totals are kept per chain for the
+process, and any tracker opened with track() on the current context (e.g. one batch line)
+gets its own running count too.
+"""
+import threading
+import contextvars
+from contextlib import contextmanager
+from utils import metrics
+
+_current = contextvars.ContextVar('usage_tracker', default=None)
+_totals_lock = threading.Lock()
+_totals = {}
+
+class UsageTracker:
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()  # Pipeline stages may record from worker threads
+
+    def add(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.calls += 1
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def as_dict(self):
+        return {'prompt_tokens': self.prompt_tokens, 'completion_tokens': self.completion_tokens, 'calls': self.calls}
+
+@contextmanager
+def track():
+    """Count tokens for every LLM call made in this context (including pipeline worker threads)."""
+    tracker = UsageTracker()
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+
+def record(chain_name, message):
+    """Add the usage reported on an AIMessage (no-op if the provider sent none)."""
+    usage = getattr(message, 'usage_metadata', None)
+    if not usage:
+        return
+    prompt_tokens = usage.get('input_tokens', 0)
+    completion_tokens = usage.get('output_tokens', 0)
+    with _totals_lock:
+        totals = _totals.setdefault(chain_name, {'prompt_tokens': 0, 'completion_tokens': 0, 'calls': 0})
+        totals['prompt_tokens'] += prompt_tokens
+        totals['completion_tokens'] += completion_tokens
+        totals['calls'] += 1
+    metrics.record_tokens(chain_name, prompt_tokens, completion_tokens)
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.add(prompt_tokens, completion_tokens)
+
+def totals():
+    """Per-chain token totals for this process."""
+    with _totals_lock:
+        return {name: dict(counts) for name, counts in _totals.items()}